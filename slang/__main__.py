@@ -1,9 +1,15 @@
-from PyQt5 import Qt
 import sys
 import slang
-from slang.slanggui import NeutronAnalysisGui
 
 def main():
+    if len(sys.argv)>1 and sys.argv[1]=='convert':
+        from slang.archive import convertmain
+        sys.exit(convertmain(sys.argv[2:]))
+    if len(sys.argv)>1 and sys.argv[1]=='catalog':
+        from slang.catalog import catalogmain
+        sys.exit(catalogmain(sys.argv[2:]))
+    from PyQt5 import Qt
+    from slang.slanggui import NeutronAnalysisGui
     # Admire! 
     app = Qt.QApplication(sys.argv)
     gui=NeutronAnalysisGui()
@@ -0,0 +1,197 @@
+import numpy as np
+import os
+
+"""
+Archive format for list data.
+
+A run is kept as an HDF5 file (run.h5) of decoded columns, which is much
+smaller than the .lst file and can be read a column at a time.
+All datasets are one dimensional, chunked and compressed (gzip, shuffled):
+
+    events/bitmap      uint8   adc bitmap of each adc event
+    events/ADC1..ADC4  uint16  adc values, masked to adc range; zero if not fired
+    events/tick        uint32  number of TIMER records before each event
+    timer/bits         uint8   b0 of each TIMER record: adc active bits
+    records/synchron   uint32  number of TIMER records before each SYNCHRON
+    records/rtc        uint32  number of TIMER records before each RTC
+
+The root group has attributes:
+
+    format             'slang list archive'
+    version            format version, 1
+    header             the INI header of the .lst file, as text
+    source             name of the .lst file
+
+Archives are written by convert(), or from the command line with
+
+    python -m slang convert run.lst [run2.lst ...]
+
+and EventSource reads them in place of the .lst file.
+h5py is needed to write or read archives.
+"""
+
+FORMAT='slang list archive'
+VERSION=1
+ARCHIVESUFFIXES=('.h5','.hdf5')
+CHUNK=1<<18
+
+def isarchive(path):
+    """
+    returns True if path names an archive, by its suffix
+    """
+    return os.path.splitext(os.fspath(path))[1].lower() in ARCHIVESUFFIXES
+
+def archivename(listfile):
+    """
+    returns default archive path for a list file: run.lst(.gz) -> run.h5
+    """
+    path=os.fspath(listfile)
+    base,ext=os.path.splitext(path)
+    if ext.lower() in ('.gz','.xz','.bz2'):
+        base,ext=os.path.splitext(base)
+    return base+ARCHIVESUFFIXES[0]
+
+def _append(dset, data):
+    n=len(dset)
+    dset.resize((n+len(data),))
+    dset[n:]=data
+
+def convert(listfile, outfile=None, level=4):
+    """
+    Convert a list file to an archive in one streaming pass.
+
+    Parameters
+    ----------
+        listfile:  path of .lst file, which may be compressed
+        outfile:   path of archive; default from archivename()
+        level:     gzip compression level
+
+    Returns path of archive. The archive is written under a temporary name
+    and renamed when complete.
+    """
+    import h5py
+    from .eventlist import EventSource, EventTable, TIMER, SYNCHRON, RTC, BLOCKSIZE
+    if outfile is None:
+        outfile=archivename(listfile)
+    outfile=os.fspath(outfile)
+    E=EventSource(listfile,usecache=False)
+    tmp=outfile+'.tmp'
+    try:
+        with h5py.File(tmp,'w') as f:
+            f.attrs['format']=FORMAT
+            f.attrs['version']=VERSION
+            f.attrs['header']=b''.join(E.header).decode()
+            f.attrs['source']=os.path.basename(os.fspath(listfile))
+            def dataset(name, dtype):
+                return f.create_dataset(name,shape=(0,),maxshape=(None,),
+                                        dtype=dtype,chunks=(CHUNK,),
+                                        compression='gzip',
+                                        compression_opts=level,shuffle=True)
+            events={k:dataset('events/'+k,EventTable.dtypes[k])
+                    for k in EventTable.columnnames}
+            timerbits=dataset('timer/bits',np.uint8)
+            records={SYNCHRON:dataset('records/synchron',np.uint32),
+                     RTC:dataset('records/rtc',np.uint32)}
+            for t in E._readblocks(BLOCKSIZE,marks=(TIMER,SYNCHRON,RTC)):
+                for k in events:
+                    _append(events[k],t[k])
+                _append(timerbits,t.timerbits)
+                for k in records:
+                    _append(records[k],t.positions[k][:,1])
+        os.replace(tmp,outfile)
+    finally:
+        E.closeFile()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return outfile
+
+class Archive(object):
+    """
+    Read access to an archive, for EventSource.
+
+    Parameters
+    ----------
+        path:      path of archive
+
+    Attributes
+    ----------
+        header:    header of .lst file, as a list of lines as bytes
+        nevents:   number of adc events
+        nticks:    number of TIMER records
+    """
+    def __init__(self, path):
+        import h5py
+        self.f=h5py.File(path,'r')
+        if self.f.attrs.get('format')!=FORMAT:
+            self.f.close()
+            raise ValueError("%s is not a list archive"%(path,))
+        header=self.f.attrs['header']
+        if isinstance(header,str): header=header.encode()
+        self.header=header.splitlines(keepends=True)
+        self.events=self.f['events']
+        self.nevents=len(self.events['bitmap'])
+        self.nticks=len(self.f['timer/bits'])
+
+    def read(self, start, stop, names=None):
+        """
+        returns dict of columns for events start to stop; all columns, or
+        only those named, with the bitmap
+        """
+        if names is None: names=self.events.keys()
+        names=set(names)|{'bitmap'}
+        return {k:self.events[k][start:stop] for k in names if k in self.events}
+
+    def tickrow(self, tick):
+        """
+        returns number of events with fewer than tick TIMER records before
+        """
+        ticks=self.events['tick']
+        lo,hi=0,self.nevents
+        while lo<hi:
+            mid=(lo+hi)//2
+            if ticks[mid]<tick: lo=mid+1
+            else: hi=mid
+        return lo
+
+    def counts(self, tick1, tick2=None):
+        """
+        returns record counts, as EventSource.counts, for records with from
+        tick1 up to tick2 TIMER records before, or to the end if tick2 is None
+        """
+        from .eventlist import TIMER, SYNCHRON, RTC, _bits
+        bits=self.f['timer/bits'][tick1:tick2]&15
+        counts={TIMER:len(bits),'busy':np.bincount(bits,minlength=16)@_bits}
+        for k,name in ((SYNCHRON,'records/synchron'),(RTC,'records/rtc')):
+            before=self.f[name][:]
+            inside=before>=tick1
+            if tick2 is not None: inside&=before<tick2
+            counts[k]=int(np.count_nonzero(inside))
+        return counts
+
+    def timerbits(self, tick1, tick2):
+        return self.f['timer/bits'][tick1:tick2]
+
+    def recordticks(self, name):
+        return self.f['records/'+name][:]
+
+    def close(self):
+        self.f.close()
+
+def convertmain(args):
+    """
+    command line: python -m slang convert [-o archive] [--level n] listfile ...
+    """
+    import argparse
+    parser=argparse.ArgumentParser(prog='python -m slang convert',
+                                   description='Convert .lst files to list archives')
+    parser.add_argument('listfiles',nargs='+',help='.lst files, may be compressed')
+    parser.add_argument('-o','--output',help='archive path (one list file only)')
+    parser.add_argument('--level',type=int,default=4,help='gzip level (default 4)')
+    a=parser.parse_args(args)
+    if a.output is not None and len(a.listfiles)>1:
+        parser.error("--output needs a single list file")
+    for fn in a.listfiles:
+        out=convert(fn,a.output,a.level)
+        print("%s -> %s (%.1f%% of size)"%(fn,out,
+              100.0*os.path.getsize(out)/os.path.getsize(fn)))
+    return 0
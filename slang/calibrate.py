@@ -110,30 +110,30 @@ class Calibrator(object):
             ENa=EventSource(self.infileNa)
             hNa=Histogram(ENa, ADC1+ADC2+ADC3, 'ADC1', 512, label="22Na")
             self.hNa = hNa
-            SNa=Sorter(ENa, [hNa] )
+            SNa=Sorter(ENa, [hNa], batchsize=BATCHSIZE )
             sortlist.append(SNa)
         if self.infileCo is not None:
             ECo=EventSource(self.infileCo)
             hCo=Histogram(ECo, ADC1+ADC2+ADC3, 'ADC1', 512, label="60Co")
             self.hCo = hCo
-            SCo=Sorter(ECo, [hCo] )
+            SCo=Sorter(ECo, [hCo], batchsize=BATCHSIZE )
             sortlist.append(SCo)
         if self.infileCs is not None:
             ECs=EventSource(self.infileCs)
             hCs=Histogram(ECs, ADC1+ADC2+ADC3, 'ADC1', 512, label="137Cs")
             self.hCs = hCs
-            SCs=Sorter(ECs, [hCs] )
+            SCs=Sorter(ECs, [hCs], batchsize=BATCHSIZE )
             sortlist.append(SCs)
         if self.infileAmBe is not None:
             EAmBe=EventSource(self.infileAmBe)
             hAmBe=Histogram(EAmBe, ADC1+ADC2+ADC3, 'ADC1', 512, label='AmBe')
             self.hAmBe = hAmBe
-            SAmBe=Sorter(EAmBe, [hAmBe] )
+            SAmBe=Sorter(EAmBe, [hAmBe], batchsize=BATCHSIZE )
             sortlist.append(SAmBe)
             
         ETAC=EventSource(self.infileTAC)
         hTAC=Histogram(ETAC, ADC1+ADC2+ADC3, 'ADC3', 1024, label='TAC')
-        STAC=Sorter(ETAC, [hTAC] )
+        STAC=Sorter(ETAC, [hTAC], batchsize=BATCHSIZE )
         self.hTAC = hTAC
         sortlist.append(STAC)
 
@@ -253,7 +253,7 @@ class CalibrationPlotter(object):
         ax1,ax2=axgroup
         data,yl,xl=hist.get_plotlabels()
         diffdata=np.zeros(len(data))
-        diffdata[1:-1]=(data[2:]-data[0:-2])/2
+        diffdata[1:-1]=(data[2:].astype(np.float64)-data[0:-2])/2 # counts may be unsigned
         slope,intercept=calib
         iscalib=(slope!=None and intercept!=None)
         isylimit=(ylimits[0]!=None and ylimits[1]!=None)
@@ -0,0 +1,231 @@
+import numpy as np
+import os
+import re
+import sqlite3
+import configparser
+import datetime
+import fnmatch
+from .mpafile import MpaFile, scaler_names
+
+"""
+Catalog of runs in a data directory tree, kept in an SQLite database.
+
+Only headers are read: the INI header of .lst files (up to [LISTDATA]) and
+of .mpa files (up to the first [DATA), so thousands of runs can be scanned
+quickly. Files already in the catalog with the same size and modification
+time are not read again.
+
+For each file the catalog holds the kind (lst, mpa, or h5 for list
+archives), size, modification time, start time from the header, adc ranges,
+scalers (at start of run in .lst files, at end of run in .mpa files) and the
+number of adc events. For .lst files this is estimated from the first block
+of list data; for archives it is exact.
+"""
+
+CATALOGNAME='slangcatalog.sqlite'
+SAMPLESIZE=1<<16  # bytes of list data decoded to estimate number of events
+
+_scalercolumns=['sc%02d'%(i+1,) for i in range(len(scaler_names))]
+
+_columns=[('path','TEXT PRIMARY KEY'),('name','TEXT'),('directory','TEXT'),
+          ('kind','TEXT'),('size','INTEGER'),('mtime','REAL'),
+          ('started','TEXT'),
+          ('adc1range','INTEGER'),('adc2range','INTEGER'),
+          ('adc3range','INTEGER'),('adc4range','INTEGER')]+\
+         [(sc,'INTEGER') for sc in _scalercolumns]+\
+         [('events','INTEGER'),('estimated','INTEGER'),('header','TEXT')]
+
+_datetime=re.compile(r'(\d\d/\d\d/\d\d\d\d \d\d:\d\d:\d\d)')
+
+def starttime(header):
+    """
+    returns first date and time in header text in ISO format, or None.
+    MPA3 writes dates as mm/dd/yyyy.
+    """
+    m=_datetime.search(header)
+    if m is None:
+        return None
+    try:
+        return datetime.datetime.strptime(m.group(1),'%m/%d/%Y %H:%M:%S').isoformat()
+    except ValueError:
+        return None
+
+def scanlist(path):
+    """
+    returns dict of catalog columns from the header of a list file
+    or archive
+    """
+    from .eventlist import EventSource, decodebuffer
+    E=EventSource(path,usecache=False)
+    try:
+        C=E.get_configuration()
+        row={'header':E.configdatastring,'started':starttime(E.configdatastring)}
+        for i,r in enumerate(E.adcranges):
+            row['adc%drange'%(i+1,)]=r
+        row.update(zip(_scalercolumns,(C.getint("MS-12 A",sc,fallback=None)
+                                       for sc in scaler_names)))
+        if E.archive is not None:
+            row['kind']='h5'
+            row['events']=E.archive.nevents
+            row['estimated']=0
+        else:
+            row['kind']='lst'
+            row['events']=None
+            row['estimated']=1
+            if not E.compressed:
+                # events per byte in first block of list data
+                raw=np.frombuffer(E.f.read(SAMPLESIZE),dtype=np.uint8)
+                t,n=decodebuffer(raw,E.adcmasks)
+                size=os.path.getsize(path)-E.dataoffset
+                row['events']=int(round(len(t)*size/n)) if n>0 else 0
+                if n>=size: row['estimated']=0
+    finally:
+        E.closeFile()
+    return row
+
+def scanmpa(path):
+    """
+    returns dict of catalog columns from the header of an .mpa file
+    """
+    m=MpaFile(path)
+    row={'kind':'mpa','header':m.header,'started':starttime(m.header),
+         'events':None,'estimated':0}
+    row.update(zip(_scalercolumns,(m.scalers[sc] for sc in scaler_names)))
+    return row
+
+def filekind(name):
+    """
+    returns scanner for a file name, or None if the file is not cataloged
+    """
+    name=name.lower()
+    for suffix in ('.lst','.lst.gz','.lst.xz','.lst.bz2','.h5','.hdf5'):
+        if name.endswith(suffix):
+            return scanlist
+    if name.endswith('.mpa'):
+        return scanmpa
+    return None
+
+class Catalog(object):
+    """
+    SQLite catalog of runs
+
+    Parameters
+    ----------
+        dbpath:    path of the database file; created if needed
+    """
+    def __init__(self, dbpath):
+        self.dbpath=dbpath
+        self.db=sqlite3.connect(dbpath)
+        self.db.row_factory=sqlite3.Row
+        self.db.execute("CREATE TABLE IF NOT EXISTS runs (%s)"%(
+            ','.join(n+' '+t for n,t in _columns),))
+        self.db.execute("CREATE INDEX IF NOT EXISTS runs_name ON runs (name)")
+        self.db.commit()
+
+    def scan(self, directory):
+        """
+        Scan a directory tree, adding new and changed files to the catalog,
+        and removing files under it which no longer exist.
+
+        Returns (number of files scanned, number unchanged, list of
+        (path, error) for files which could not be read)
+        """
+        known={r['path']:(r['size'],r['mtime']) for r in self.db.execute(
+            "SELECT path,size,mtime FROM runs")}
+        top=os.path.abspath(directory)
+        seen=set()
+        nscanned=0
+        nunchanged=0
+        errors=[]
+        for dirpath,dirnames,filenames in os.walk(top):
+            dirnames[:]=[d for d in dirnames if not d.endswith('.evcache')]
+            for fn in filenames:
+                scanner=filekind(fn)
+                if scanner is None:
+                    continue
+                path=os.path.join(dirpath,fn)
+                st=os.stat(path)
+                seen.add(path)
+                if known.get(path)==(st.st_size,st.st_mtime):
+                    nunchanged+=1
+                    continue
+                try:
+                    row=scanner(path)
+                except (OSError,ValueError,KeyError,ImportError,
+                        configparser.Error) as e:
+                    # e.g. an archive without h5py installed
+                    errors.append((path,str(e)))
+                    continue
+                row.update(path=path,name=fn,directory=dirpath,
+                           size=st.st_size,mtime=st.st_mtime)
+                names=[n for n,t in _columns]
+                self.db.execute("INSERT OR REPLACE INTO runs (%s) VALUES (%s)"%(
+                    ','.join(names),','.join('?'*len(names))),
+                    [row.get(n) for n in names])
+                nscanned+=1
+        gone=[p for p in known if p not in seen and
+              (p+os.sep).startswith(top+os.sep)]
+        self.db.executemany("DELETE FROM runs WHERE path=?",[(p,) for p in gone])
+        self.db.commit()
+        return nscanned,nunchanged,errors
+
+    def query(self, pattern=None, kind=None, where=None, params=()):
+        """
+        returns list of rows (sqlite3.Row, indexed by column name) of runs,
+        ordered by start time and name.
+
+        pattern:  shell pattern for file name, e.g. 'NE213_*'
+        kind:     'lst', 'mpa' or 'h5'
+        where:    further SQL condition on columns, with ? for params
+        """
+        conditions=[]
+        args=[]
+        if kind is not None:
+            conditions.append("kind=?")
+            args.append(kind)
+        if where is not None:
+            conditions.append("(%s)"%(where,))
+            args.extend(params)
+        sql="SELECT * FROM runs"
+        if conditions:
+            sql+=" WHERE "+" AND ".join(conditions)
+        sql+=" ORDER BY started, name"
+        rows=self.db.execute(sql,args).fetchall()
+        if pattern is not None:
+            rows=[r for r in rows if fnmatch.fnmatch(r['name'],pattern)]
+        return rows
+
+    def close(self):
+        self.db.close()
+
+def catalogmain(args):
+    """
+    command line: python -m slang catalog {scan,list} ...
+    """
+    import argparse
+    parser=argparse.ArgumentParser(prog='python -m slang catalog',
+                                   description='Catalog run headers in SQLite')
+    parser.add_argument('--db',help='catalog file (default %s in directory)'%(CATALOGNAME,))
+    sub=parser.add_subparsers(dest='command',required=True)
+    p=sub.add_parser('scan',help='scan a directory tree')
+    p.add_argument('directory')
+    p=sub.add_parser('list',help='list runs')
+    p.add_argument('directory',nargs='?',default='.')
+    p.add_argument('pattern',nargs='?',help='shell pattern for file names')
+    p.add_argument('--kind',choices=('lst','mpa','h5'))
+    a=parser.parse_args(args)
+    db=a.db if a.db is not None else os.path.join(a.directory,CATALOGNAME)
+    cat=Catalog(db)
+    if a.command=='scan':
+        n,same,errors=cat.scan(a.directory)
+        print("%d files scanned, %d unchanged, %d errors"%(n,same,len(errors)))
+        for path,e in errors:
+            print("  %s: %s"%(path,e))
+    else:
+        for r in cat.query(a.pattern,a.kind):
+            events='' if r['events'] is None else \
+                ('~%d' if r['estimated'] else '%d')%(r['events'],)
+            print("%-40s %-4s %12d %-19s %s"%(r['name'],r['kind'],r['size'],
+                  r['started'] or '',events))
+    cat.close()
+    return 0
@@ -0,0 +1,136 @@
+import numpy as np
+import os
+import hashlib
+import configparser
+
+"""
+Cache of decoded list data, kept beside the list file.
+
+The decoded event columns of run.lst are kept as raw arrays in the directory
+run.lst.evcache, one file per column, with a key file describing them.
+The key records the path, size and modification time of the list file and a
+hash of its header. The cache is valid only if all of these still match, so
+a list file which is rewritten or still being written is decoded again.
+
+Columns are written as the stream is decoded, and the key is written last,
+so a cache left by an interrupted sort is never used.
+"""
+
+CACHESUFFIX='.evcache'
+KEYFILE='key.ini'
+VERSION='2'
+
+def _config():
+    C=configparser.ConfigParser(interpolation=None)
+    C.optionxform=str  # column names are case sensitive
+    return C
+
+def cachedir(listfile):
+    """
+    returns path of cache directory for a list file
+    """
+    return os.fspath(listfile)+CACHESUFFIX
+
+def headerhash(header):
+    """
+    returns sha1 hex digest of header, a list of lines as bytes
+    """
+    h=hashlib.sha1()
+    for b in header: h.update(b)
+    return h.hexdigest()
+
+def listkey(listfile, header):
+    """
+    returns dict identifying the list file contents
+    """
+    st=os.stat(listfile)
+    return {'path':os.path.abspath(listfile),'size':str(st.st_size),
+            'mtime':str(st.st_mtime_ns),'header':headerhash(header),
+            'version':VERSION}
+
+def load(listfile, header):
+    """
+    Load cached columns for a list file.
+
+    Returns (columns, counts), where columns is a dict of read-only
+    numpy.memmap arrays, or None if there is no valid cache.
+    """
+    d=cachedir(listfile)
+    C=_config()
+    try:
+        if not C.read(os.path.join(d,KEYFILE)):
+            return None
+        if dict(C['key'])!=listkey(listfile, header):
+            return None
+        length=C.getint('columns','length')
+        columns={}
+        for name in C['dtypes']:
+            dtype=np.dtype(C.get('dtypes',name))
+            fn=os.path.join(d,name+'.bin')
+            if os.path.getsize(fn)!=length*dtype.itemsize:
+                return None
+            if length>0:
+                columns[name]=np.memmap(fn,dtype=dtype,mode='r',shape=(length,))
+            else:
+                columns[name]=np.zeros(0,dtype=dtype)
+        counts={int(k):C.getint('counts',k) for k in C['counts'] if k!='busy'}
+        counts['busy']=np.array(C.get('counts','busy').split(),dtype=np.int64)
+    except (OSError,KeyError,ValueError,configparser.Error):
+        return None
+    return columns,counts
+
+def clear(listfile):
+    """
+    Remove the cache for a list file, if any
+    """
+    d=cachedir(listfile)
+    if not os.path.isdir(d):
+        return
+    for fn in os.listdir(d):
+        os.remove(os.path.join(d,fn))
+    os.rmdir(d)
+
+class CacheWriter(object):
+    """
+    Write decoded columns to the cache of a list file as they are decoded.
+
+    append() writes the columns of each table in turn, and commit() writes the
+    key once the whole stream has been written. Any error leaves no cache.
+    """
+    def __init__(self, listfile, header):
+        self.listfile=listfile
+        self.key=listkey(listfile, header)
+        self.dir=cachedir(listfile)
+        self.files={}
+        self.dtypes={}
+        self.length=0
+        clear(listfile)
+        os.makedirs(self.dir)
+
+    def append(self, columns):
+        for name,v in columns.items():
+            if name not in self.files:
+                self.files[name]=open(os.path.join(self.dir,name+'.bin'),'wb')
+                self.dtypes[name]=v.dtype.str
+            np.ascontiguousarray(v).tofile(self.files[name])
+        self.length+=len(v)
+
+    def commit(self, counts):
+        for f in self.files.values(): f.close()
+        C=_config()
+        C['key']=self.key
+        C['columns']={'length':str(self.length)}
+        C['dtypes']=self.dtypes
+        C['counts']={str(k):str(v) for k,v in counts.items() if k!='busy'}
+        C['counts']['busy']=' '.join(str(n) for n in counts['busy'])
+        tmp=os.path.join(self.dir,KEYFILE+'.tmp')
+        with open(tmp,'w') as f:
+            C.write(f)
+        os.replace(tmp,os.path.join(self.dir,KEYFILE))
+
+    def abort(self):
+        for f in self.files.values(): f.close()
+        try:
+            clear(self.listfile)
+        except OSError:
+            pass
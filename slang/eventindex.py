@@ -0,0 +1,94 @@
+import numpy as np
+import os
+from . import eventcache
+
+"""
+Index of positions in list data, for seeking into a run.
+
+The index holds the byte offset (from the start of the list data) of every
+step-th TIMER record and every step-th SYNCHRON marker, with the number of
+TIMER records and of adc events before each. It is built in one pass of the
+vectorized decoder and saved beside the list file as run.lst.idx, keyed to
+the list file in the same way as the event cache.
+"""
+
+INDEXSUFFIX='.idx'
+DEFAULTSTEP=1000   # 1 s at the default timer period
+
+def indexfile(listfile):
+    """
+    returns path of index file for a list file
+    """
+    return os.fspath(listfile)+INDEXSUFFIX
+
+class EventIndex(object):
+    """
+    Offsets of TIMER records and SYNCHRON markers in list data
+
+    Attributes
+    ----------
+        ticks:  (n,3) int64 array of byte offset, TIMER records before and
+                adc events before, for every step-th TIMER record
+        marks:  same for every step-th SYNCHRON marker
+        end:    same for the end of the list data
+        step:   index granularity
+    """
+    def __init__(self, ticks, marks, end, step):
+        self.ticks=ticks
+        self.marks=marks
+        self.end=end
+        self.step=step
+
+    @classmethod
+    def build(cls, source, step=DEFAULTSTEP):
+        """
+        Build the index in one pass over the list data of an EventSource.
+        The position of the source is left at the end of the data.
+        """
+        from .eventlist import TIMER, SYNCHRON
+        source._seekentry((0,0,0))
+        ticks=[np.zeros((0,3),dtype=np.int64)]
+        marks=[np.zeros((0,3),dtype=np.int64)]
+        nmark=0
+        nevent=0
+        for t in source._readblocks(1<<24,marks=(TIMER,SYNCHRON)):
+            a=t.positions[TIMER]
+            ticks.append(a[a[:,1]%step==0])
+            a=t.positions[SYNCHRON]
+            marks.append(a[(np.arange(len(a))+nmark)%step==0])
+            nmark+=len(a)
+            nevent+=len(t)
+        end=np.array([source.f.tell()-source.dataoffset,source.counts[TIMER],
+                      nevent],dtype=np.int64)
+        return cls(np.concatenate(ticks),np.concatenate(marks),end,step)
+
+    def entry(self, column, value):
+        """
+        returns last row of ticks with column at most value, or the start
+        of the data if there is none
+        """
+        i=np.searchsorted(self.ticks[:,column],value,side='right')
+        if i==0:
+            return np.zeros(3,dtype=np.int64)
+        return self.ticks[i-1]
+
+    def save(self, listfile, header):
+        key=eventcache.listkey(listfile, header)
+        with open(indexfile(listfile),'wb') as f:
+            np.savez(f,ticks=self.ticks,marks=self.marks,end=self.end,
+                     step=self.step,key=np.array(sorted(key.items())))
+
+    @classmethod
+    def load(cls, listfile, header):
+        """
+        returns the saved index of a list file, or None if there is no
+        valid index
+        """
+        key=eventcache.listkey(listfile, header)
+        try:
+            with np.load(indexfile(listfile)) as d:
+                if d['key'].tolist()!=[list(k) for k in sorted(key.items())]:
+                    return None
+                return cls(d['ticks'],d['marks'],d['end'],int(d['step']))
+        except (OSError,KeyError,ValueError):
+            return None
@@ -1,8 +1,18 @@
 import numpy as np
 import io
+import os
 import configparser
+import gzip
+import lzma
+import bz2
 from enum import IntEnum
 import time
+import ast
+import functools
+from . import eventcache
+from .eventindex import EventIndex, DEFAULTSTEP
+from . import archive
+from .sparse import BlockedCounts
 
 class EventFlags(IntEnum):
     """
@@ -62,18 +72,747 @@ TOTALADCS=4
 # unlikely adc is set to many of these, but ...
 powers_of_two=[2,4,8,16,32,64,128,256,512,1024,2048,4096,8192]
 
+# size of blocks read by the vectorized decoder, in bytes
+BLOCKSIZE=1<<24
+# openers for compressed list files, by suffix
+compressors={'.gz':gzip.open,'.xz':lzma.open,'.bz2':bz2.open}
+
+# number of events in batches for batch sorting
+BATCHSIZE=1000000
+# most bytes of events kept in memory by a sort, for replay of gates
+MAXKEPT=1<<29
+# TIMER period in ms
+TICKPERIOD=1.0
+
+def newcounts():
+    """
+    returns dict of record counts from a decode, all zero. As well as counts
+    of TIMER, SYNCHRON and RTC records, 'busy' holds the number of TIMER
+    records with the active bit of each adc set in b0.
+    """
+    return {TIMER:0,SYNCHRON:0,RTC:0,'busy':np.zeros(TOTALADCS,dtype=np.int64)}
+
+def addcounts(total, counts):
+    """
+    add counts to total, without changing arrays which may be shared
+    """
+    for k in counts: total[k]=total[k]+counts[k]
+
+def livetime(counts, tickperiod=TICKPERIOD):
+    """
+    Dead time from the TIMER records of a decode.
+
+    A TIMER record is written every tickperiod ms, and the bit of an adc in
+    b0 is taken to mean that the adc was busy (converting) at that tick, so
+    the adc is live for the ticks where its bit is clear.
+
+    Returns
+    -------
+        dict of 'realtime' in ms, and arrays by adc of 'livetime' in ms and
+        'deadfraction'
+    """
+    nticks=counts[TIMER]
+    busy=np.asarray(counts['busy'])
+    realtime=nticks*tickperiod
+    livetime=(nticks-busy)*tickperiod
+    deadfraction=busy/nticks if nticks>0 else np.zeros(TOTALADCS)
+    return {'realtime':realtime,'livetime':livetime,'deadfraction':deadfraction}
+
+class EventTable(object):
+    """
+    Columnar table of adc events, as decoded from a list stream.
+
+    Columns are numpy arrays of the same length, accessed by name:
+        bitmap     uint8   bitmap of adcs in event (the coincidence group)
+        ADC1..ADC4 uint16  adc values, masked to adc range; zero if not fired
+        tick       uint32  number of TIMER ticks before event
+    A table may hold only some of these columns (see project()).
+
+    Parameters
+    ----------
+        columns:   dict of column name: array
+        counts:    dict of counts of records in the part of stream decoded,
+                   as from newcounts(); None if not known
+
+    Tables from project() share the columns of the original table. Tables
+    from filter() and group() have copies of the columns, except that
+    filter() with a slice, as used by eventbatches(), gives views of them.
+    """
+    columnnames=('bitmap',)+adcnames+('tick',)
+    dtypes={'bitmap':np.uint8,'ADC1':np.uint16,'ADC2':np.uint16,
+            'ADC3':np.uint16,'ADC4':np.uint16,'tick':np.uint32}
+
+    def __init__(self, columns, counts=None):
+        self.columns=columns
+        self.counts=counts
+
+    @classmethod
+    def empty(cls, names=None):
+        """
+        Return a table with no events
+        """
+        if names is None: names=cls.columnnames
+        return cls({k:np.zeros(0,dtype=cls.dtypes[k]) for k in names},
+                   newcounts())
+
+    @classmethod
+    def concatenate(cls, tables):
+        """
+        Join tables end to end. Counts are summed if known for all tables.
+        """
+        if len(tables)==0:
+            return cls.empty()
+        if len(tables)==1:
+            return tables[0]
+        columns={k:np.concatenate([t.columns[k] for t in tables])
+                 for k in tables[0].columns}
+        counts=None
+        if all(t.counts is not None for t in tables):
+            counts=newcounts()
+            for t in tables: addcounts(counts,t.counts)
+        return cls(columns,counts)
+
+    def __len__(self):
+        return len(self.columns['bitmap']) if 'bitmap' in self.columns else \
+            len(next(iter(self.columns.values()),()))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def names(self):
+        return tuple(self.columns.keys())
+
+    def values(self):
+        """
+        Return (n,4) array of adc values, as in the tuple from eventstream()
+        """
+        return np.stack([self.columns[k] for k in adcnames],axis=1)
+
+    def filter(self, mask):
+        """
+        Select events by a boolean mask or an index array
+        """
+        return EventTable({k:v[mask] for k,v in self.columns.items()})
+
+    def project(self, names):
+        """
+        Select columns by name; the bitmap is always kept
+        """
+        names=set(names)|{'bitmap'}
+        return EventTable({k:v for k,v in self.columns.items() if k in names},
+                          self.counts)
+
+    def group(self, group):
+        """
+        Select events of a coincidence group, i.e. events with this bitmap
+        """
+        return self.filter(self.columns['bitmap']==group)
+
+"""
+Tables for the vectorized decoder.
+
+The words of the list stream cannot be classified independently, since adc
+data words may look like any other word. The decoder therefore has to find
+which words start a record, working from the start of the block.
+At a word boundary the start of the next record is 0, 1 or 2 words ahead
+(a record is at most 3 words long). Each word maps this offset to the offset
+at the next boundary. The maps of groups of 8 words are looked up in a table
+indexed by the record lengths, and then composed in a tree (a parallel
+prefix scan) rather than stepped through one record at a time.
+A map f is encoded as f(0)*9+f(1)*3+f(2); _compose[g*27+f] encodes g(f(s)),
+_apply[f*3+s] is f(s).
+"""
+_maps=np.array([(a,b,c) for a in range(3) for b in range(3) for c in range(3)])
+_compose=(_maps[:,None,_maps[:,0]]*9+_maps[:,None,_maps[:,1]]*3
+          +_maps[:,None,_maps[:,2]]).astype(np.uint8).ravel()
+_apply=_maps.astype(np.uint8).ravel()
+
+def _maketables():
+    """
+    Maps and record start bitmaps for groups of 8 words, indexed by
+    sum((length-1)*3**j). _groupstarts[index*3+s] has bit j set if word j
+    starts a record, entering the group with offset s.
+    """
+    lengths=(np.arange(3**8)[:,None]//3**np.arange(8))%3
+    s=np.tile(np.arange(3),(3**8,1))
+    bits=np.zeros((3**8,3),dtype=np.uint8)
+    for j in range(8):
+        bits|=np.where(s==0,1<<j,0).astype(np.uint8)
+        s=np.where(s==0,lengths[:,j,None],s-1)
+    return (s[:,0]*9+s[:,1]*3+s[:,2]).astype(np.uint8),bits.ravel()
+_groupmaps,_groupstarts=_maketables()
+
+# record type from b3: 0 for adc event, else TIMER, SYNCHRON or RTC
+_kind=np.zeros(256,dtype=np.uint8)
+_kind[[e for e in range(256) if e&RTC]]=RTC
+_kind[TIMER]=TIMER
+_kind[SYNCHRON]=SYNCHRON
+# adc events from b3: 0 if not adc event, 1 if not padded, 2 if padded
+_adcevent=np.where(_kind==0,1+(np.arange(256)&PAD!=0),0).astype(np.uint8)
+# number of adcs fired from b0
+_nadcs=np.array([bin(i&15).count('1') for i in range(256)],dtype=np.uint8)
+# record length-1 in words, indexed by b3<<8|b0;
+# padding and adc data are packed in 2-byte units
+_lengths=np.where(_adcevent[:,None]>0,
+                  np.minimum((_adcevent[:,None]+_nadcs)>>1,2),0).astype(np.uint8).ravel()
+# position of data of each adc in the 2-byte units following an event word,
+# or -1 if not fired; indexed by padded<<4|(b0&15)
+_datapos=np.array([[(k>>4)+_nadcs[k&((1<<i)-1)] if k>>i&1 else -1
+                    for k in range(32)] for i in range(TOTALADCS)])
+# as _datapos, relative to the event word, which is read for adcs not fired
+_dataoffset=np.where(_datapos>=0,_datapos,-2)
+
+# bits of adcs in bitmaps
+_bits=(np.arange(16)[:,None]>>np.arange(TOTALADCS))&1
+
+def _recordstarts(lengths):
+    """
+    Return boolean mask of words which start a record, given the length-1
+    in words of the record each word would start.
+    """
+    n=len(lengths)
+    ngroups=max((n+7)//8,1)
+    size=1<<(ngroups-1).bit_length()
+    l=np.zeros(size*8,dtype=np.uint8)
+    l[:n]=lengths
+    l=l[0::2]+l[1::2]*np.uint8(3)
+    l=l[0::2]+l[1::2]*np.uint8(9)
+    index=l[0::2]+l[1::2]*np.uint16(81)
+    f=np.take(_groupmaps,index)
+    levels=[]
+    while len(f)>1:
+        levels.append(f)
+        f=np.take(_compose,f[1::2]*np.uint16(27)+f[0::2])
+    s=np.zeros(1,dtype=np.uint8)
+    for f in reversed(levels):
+        t=np.empty(len(f),dtype=np.uint8)
+        t[0::2]=s
+        t[1::2]=np.take(_apply,f[0::2]*np.uint16(3)+s)
+        s=t
+    bits=np.take(_groupstarts,index*np.uint16(3)+s)
+    return np.unpackbits(bits,bitorder='little')[:n].view(bool)
+
+def _decodebuffer(raw, adcmasks, marks=None):
+    """
+    Decode list data in a uint8 array, which starts at a record boundary.
+
+    Decoding stops at the end of the buffer, before an incomplete record,
+    or after an adc event whose data does not fill a whole number of words
+    (the stream is then no longer word aligned).
+
+    Returns
+    -------
+        bitmap:   uint8 array of adc bitmaps of adc events
+        values:   list of 4 uint16 arrays of masked adc values, zero if not fired
+        ticks:    uint32 array of number of TIMER records before each event
+        counts:   dict of record counts, as from newcounts()
+        consumed: number of bytes decoded
+        positions: if marks is a list of record types (0 for adc events),
+                  dict of (n,3) int64 arrays of byte offset, TIMER records
+                  before and adc events before, for records of those types;
+                  with TIMER, also 'timerbits', the b0 of the TIMER records
+    """
+    nw=len(raw)//4
+    words=raw[:4*nw].view('<u4')
+    data=raw[:len(raw)//2*2].view('<u2')
+    b0=raw[0:4*nw:4]
+    b3=raw[3:4*nw:4]
+    lengths=np.take(_lengths,(b3.astype(np.uint16)<<8)|b0)
+    starts=np.flatnonzero(_recordstarts(lengths))
+    w=np.take(words,starts)
+    kind=np.take(_kind,w>>24)
+    isevent=kind==0
+    istimer=kind==TIMER
+    p=starts[isevent]
+    ticks=np.cumsum(istimer,dtype=np.uint32)[isevent]
+    w=w[isevent]
+    padded=(w>>31).astype(np.uint8)
+    bitmap=w.astype(np.uint8)
+    half=padded+np.take(_nadcs,bitmap)
+    last=len(starts)
+    consumed=4*nw
+    if len(p)>0 and 2*p[-1]+2+half[-1]>len(data):
+        # stop before an incomplete event
+        last-=1
+        consumed=4*int(p[-1])
+        p=p[:-1]
+        w=w[:-1]
+        half=half[:-1]
+        padded=padded[:-1]
+        bitmap=bitmap[:-1]
+        ticks=ticks[:-1]
+    odd=np.flatnonzero(half&1)
+    if len(odd)>0:
+        # stop after an event which leaves the stream misaligned
+        n=odd[0]+1
+        last=np.searchsorted(starts,p[n-1])+1
+        consumed=4*int(p[n-1])+4+2*int(half[n-1])
+        p=p[:n]
+        w=w[:n]
+        padded=padded[:n]
+        bitmap=bitmap[:n]
+        ticks=ticks[:n]
+    zero=w==0
+    if zero.any():
+        # zero words are skipped
+        keep=~zero
+        p=p[keep]
+        padded=padded[keep]
+        bitmap=bitmap[keep]
+        ticks=ticks[keep]
+    # unpack adc data: the position of the data of each adc (and its mask,
+    # zero if not fired) is looked up from the pattern of adcs fired
+    pattern=(padded<<4)|(bitmap&15)
+    fired=int(np.bitwise_or.reduce(bitmap)) if len(bitmap)>0 else 0
+    q=2*p+2
+    values=[]
+    for j in range(TOTALADCS):
+        if not fired>>j&1:
+            values.append(np.zeros(len(p),dtype=np.uint16))
+            continue
+        v=np.take(data,q+np.take(_dataoffset[j],pattern))
+        v&=np.take(np.where(_datapos[j]>=0,adcmasks[j],0).astype(np.uint16),pattern)
+        values.append(v)
+    kind=kind[:last]
+    istimer=istimer[:last]
+    counts={k:int(np.count_nonzero(kind==k)) for k in (TIMER,SYNCHRON,RTC)}
+    active=np.take(b0,starts[:last][istimer])&15
+    counts['busy']=np.bincount(active,minlength=16)@_bits
+    if marks is None:
+        return bitmap,values,ticks,counts,consumed
+    positions={}
+    for k in marks:
+        if k==0:
+            positions[k]=np.stack([4*p,ticks,np.arange(len(p))],axis=1)
+        else:
+            i=np.flatnonzero(kind==k)
+            s=starts[i]
+            before=(np.cumsum(istimer)-istimer)[i]
+            positions[k]=np.stack([4*s,before,np.searchsorted(p,s)],axis=1)
+            if k==TIMER:
+                positions['timerbits']=np.take(b0,s)
+        positions[k]=positions[k].astype(np.int64)
+    return bitmap,values,ticks,counts,consumed,positions
+
+def decodebuffer(raw, adcmasks, tick0=0, window=1<<20, marks=None):
+    """
+    Decode as much list data as possible from a uint8 array which starts at
+    a record boundary, following the stream through misaligned events.
+    The array is decoded in windows of the given number of bytes.
+
+    Parameters
+    ----------
+        raw:      uint8 array of list data
+        adcmasks: masks for adc values, from EventSource
+        tick0:    number of TIMER ticks before the start of raw
+        marks:    list of record types to find, 0 for adc events
+
+    Returns
+    -------
+        table:    EventTable of adc events decoded
+        consumed: number of bytes decoded; any bytes following belong to
+                  an incomplete record
+
+    If marks is given, table.positions is a dict of (n,3) int64 arrays of
+    byte offset in raw, TIMER records before (from tick0) and adc events
+    before, for each record of these types. With TIMER, table.timerbits is
+    the b0 of each TIMER record, with the adc active bits.
+    """
+    tables=[]
+    positions=[]
+    counts=newcounts()
+    consumed=0
+    nevent=0
+    while True:
+        start=consumed
+        r=_decodebuffer(raw[start:start+window],adcmasks,marks)
+        b,v,t,c,n=r[:5]
+        columns=dict(zip(adcnames,v))
+        columns['bitmap']=b
+        columns['tick']=t+np.uint32(tick0+counts[TIMER])
+        if marks is not None:
+            m=r[5]
+            for k in marks:
+                m[k]=m[k]+(start,tick0+counts[TIMER],nevent)
+            positions.append(m)
+        addcounts(counts,c)
+        tables.append(EventTable(columns))
+        consumed+=n
+        nevent+=len(b)
+        # done at end of data, unless stopped by a misaligned event
+        if n==0 or n%4==0 and start+window>=len(raw):
+            break
+    table=EventTable.concatenate(tables)
+    table.counts=counts
+    if marks is not None:
+        table.positions={k:np.concatenate([m[k] for m in positions])
+                         for k in positions[0]}
+        if TIMER in marks:
+            table.timerbits=table.positions.pop('timerbits')
+    return table,consumed
+
+def _recordsize(raw, p):
+    """
+    returns size in bytes of the record at byte p of raw
+    """
+    b3=raw[p+3]
+    if _kind[b3]!=0:
+        return 4
+    return 4+2*(int(b3>>7)+int(_nadcs[raw[p]]))
+
+def _syncpoint(raw):
+    """
+    Find a record boundary in list data without knowing where records start.
+
+    raw should start at an even offset in the list data. Records start at
+    even offsets and are at most 14 bytes long, so one of the even offsets
+    below 14 is a record boundary. The records following each of these are
+    followed until they all meet; from there on the record boundaries are the
+    same whichever was the true one.
+
+    Returns the offset in raw of the meeting point, or None if there is none.
+    """
+    pos=list(range(0,14,2))
+    while True:
+        lo=min(pos)
+        if lo==max(pos):
+            return lo
+        if lo+4>len(raw):
+            return None
+        i=pos.index(lo)
+        pos[i]=lo+_recordsize(raw,lo)
+
+def _sortsegment(filename, usemmap, histlist, start, stop, batchsize, gates):
+    """
+    Sort the list data from byte start up to stop, which must be record
+    boundaries, into new histograms like those of histlist, with the
+    named gates of the parent process.
+    Runs in a worker process for Sorter.sortparallel().
+
+    Returns list of histogram data, counts of events by bitmap, the offset
+    reached by the decoder and the record counts.
+    """
+    E=EventSource(filename,usemmap=usemmap,usecache=False)
+    E._seekentry((start,0,0))
+    E.stopoffset=stop
+    gatelist.update(gates)
+    for h in histlist:
+        h.clear()
+    S=Sorter(E,histlist,batchsize=batchsize)
+    bitmapcounts=S.sortbatches()
+    return [h.data for h in histlist],bitmapcounts,E.decoded,E.counts
+
 gatelist = {}
-class Gate2d(object):
+LUTROWS=512  # rows of gate lookup table rasterized at a time
+
+class Gate(object):
+    """
+    Base class of gates on adc events.
+
+    Gates combine into expressions with & (and), | (or) and ~ (not), e.g.
+    neutrons & ~pileup & Lwindow. A string is read as an expression of
+    names in gatelist by parsegate(). tablemask() gives the mask of the
+    events of an EventTable inside the gate, accepts() tests one event.
+    """
+    def __and__(self, other):
+        return GateExpr('&',(self,gateexpr(other)))
+
+    def __or__(self, other):
+        return GateExpr('|',(self,gateexpr(other)))
+
+    def __invert__(self):
+        return GateExpr('~',(self,))
+
+    def key(self):
+        """
+        returns key identifying the gate, for sharing its masks
+        """
+        return id(self)
+
+    def names(self):
+        """
+        returns set of names of the gates the gate is made of
+        """
+        return {self.name}
+
+    def columns(self):
+        """
+        returns set of names of event columns tested by the gate
+        """
+        raise NotImplementedError
+
+    def tablemask(self, table, masks=None):
+        """
+        returns boolean mask of the events of an EventTable inside the gate
+        """
+        raise NotImplementedError
+
+    def accepts(self, v):
+        """
+        returns True if an event with adc values v (as from eventstream())
+        is inside the gate
+        """
+        raise NotImplementedError
+
+    def __repr__(self):
+        return self.name
+
+class Gate1d(Gate):
+    """
+    1-d window lo<=value<hi on raw values of an adc
+
+    Parameters
+    ----------
+        name:      name of gate
+        adc:       adc name, e.g. 'ADC1'
+        lo,hi:     limits of window; hi=None for no upper limit
+    """
+    def __init__(self, name, adc, lo, hi=None):
+        self.name=name
+        self.adc=adc
+        self.index=int(adc[3])-1
+        self.lo=lo
+        self.hi=hi
+
+    def columns(self):
+        return {self.adc}
+
+    def tablemask(self, table, masks=None):
+        v=table[self.adc]
+        m=v>=self.lo
+        if self.hi is not None:
+            m&=v<self.hi
+        return m
+
+    def accepts(self, v):
+        x=v[self.index]
+        return x>=self.lo and (self.hi is None or x<self.hi)
+
+class GateRef(Gate):
+    """
+    Gate named in gatelist, looked up each time it is used, so an
+    expression follows a gate which is redrawn
+    """
+    def __init__(self, name):
+        self.name=name
+
+    def gate(self):
+        return gatelist[self.name]
+
+    def key(self):
+        return self.gate().key()
+
+    def columns(self):
+        return self.gate().columns()
+
+    def tablemask(self, table, masks=None):
+        return self.gate().tablemask(table,masks)
+
+    def accepts(self, v):
+        return self.gate().accepts(v)
+
+class GateExpr(Gate):
+    """
+    Gate combining gates by op, one of '&', '|' or '~'
+    """
+    def __init__(self, op, operands):
+        self.op=op
+        self.operands=tuple(operands)
+
+    def key(self):
+        return (self.op,)+tuple(g.key() for g in self.operands)
+
+    def names(self):
+        return set().union(*(g.names() for g in self.operands))
+
+    def columns(self):
+        return set().union(*(g.columns() for g in self.operands))
+
+    def tablemask(self, table, masks=None):
+        if masks is None:
+            masks=GateMasks(table)
+        m=[masks(g) for g in self.operands]
+        if self.op=='~':
+            return ~m[0]
+        if self.op=='&':
+            return m[0]&m[1]
+        return m[0]|m[1]
+
+    def accepts(self, v):
+        if self.op=='~':
+            return not self.operands[0].accepts(v)
+        if self.op=='&':
+            return all(g.accepts(v) for g in self.operands)
+        return any(g.accepts(v) for g in self.operands)
+
+    def __repr__(self):
+        if self.op=='~':
+            return '~%r'%(self.operands[0],)
+        return '(%r %s %r)'%(self.operands[0],self.op,self.operands[1])
+
+_gateops={ast.BitAnd:'&',ast.BitOr:'|'}
+
+@functools.lru_cache(maxsize=None)
+def parsegate(text):
+    """
+    returns gate for an expression such as 'neutrons & ~pileup & Lwindow'
+    of names in gatelist, with &, |, ~ and parentheses as in python.
+    Names are looked up when the gate is used.
+    """
+    def build(node):
+        if isinstance(node,ast.Name):
+            return GateRef(node.id)
+        if isinstance(node,ast.UnaryOp) and isinstance(node.op,ast.Invert):
+            return ~build(node.operand)
+        if isinstance(node,ast.BinOp) and type(node.op) in _gateops:
+            return GateExpr(_gateops[type(node.op)],
+                            (build(node.left),build(node.right)))
+        raise ValueError("invalid gate expression: "+text)
+    if text in gatelist:
+        return GateRef(text)
+    try:
+        tree=ast.parse(text.strip(),mode='eval')
+    except SyntaxError:
+        raise ValueError("invalid gate expression: "+text)
+    return build(tree.body)
+
+def gateexpr(gate):
+    """
+    returns Gate for a gate, or a gate expression as a string
+    """
+    if isinstance(gate,str):
+        return parsegate(gate)
+    if not isinstance(gate,Gate):
+        raise TypeError("not a gate: %r"%(gate,))
+    return gate
+
+class GateMasks(object):
+    """
+    Masks of the events of an EventTable inside gates. Each gate or
+    subexpression is evaluated once per table, however many histograms
+    and expressions use it.
+    """
+    def __init__(self, table):
+        self.table=table
+        self.masks={}
+
+    def __call__(self, gate):
+        gate=gateexpr(gate)
+        key=gate.key()
+        m=self.masks.get(key)
+        if m is None:
+            m=self.masks[key]=gate.tablemask(self.table,self)
+        return m
+
+class Gate2d(Gate):
 
     def __init__(self, name, vertlist):
         """
-        2-d gate
+        2-d gate: polygon of vertices vertlist, in the coordinates of the
+        plot it was drawn on. setaxes() must be called before the gate is
+        used, to relate them to raw adc values.
         """
         self.name=name
         self.vertlist=vertlist
-        self.gatearray=None
-        self.ingate=True
-        
+        self.adc1=self.adc2=None
+        self._lut=None
+
+    def setaxes(self, adc1, adc2, range1, range2, map1=(1.0,0.0), map2=(1.0,0.0)):
+        """
+        Set the adcs (x,y) of the gate, their ranges and the affine maps
+        (scale,offset), coordinate=raw*scale+offset, from raw adc values to
+        the coordinates of the vertices. The gate is tested on raw adc
+        values, whatever the binning of the histogram it was drawn on.
+        """
+        self.adc1=adc1
+        self.adc2=adc2
+        self.range1=range1
+        self.range2=range2
+        self.map1=map1
+        self.map2=map2
+        self._lut=None
+
+    def packedlut(self):
+        """
+        returns the gate over the full ranges of raw adc values as a bit
+        packed array [v2,v1>>3] of uint8, with bit v1&7 set inside the
+        gate; 8 MB for two 8192 channel adcs. Built a block of rows at a
+        time, so the unpacked table is never held whole.
+        """
+        if self._lut is None:
+            (s1,o1),(s2,o2)=self.map1,self.map2
+            x=np.arange(self.range1)*s1+o1
+            y=np.arange(self.range2)*s2+o2
+            self._lut=np.concatenate([np.packbits(self._raster(x,y[i:i+LUTROWS]),
+                                                  axis=1,bitorder='little')
+                                      for i in range(0,len(y),LUTROWS)])
+        return self._lut
+
+    def lut(self):
+        """
+        returns unpacked boolean array [v2,v1] over the full ranges of raw
+        adc values, True inside the gate
+        """
+        return np.unpackbits(self.packedlut(),axis=1,count=self.range1,
+                             bitorder='little').view(bool)
+
+    def inside(self, v1, v2):
+        """
+        returns True if raw adc values v1 (x) and v2 (y) are inside the gate
+        """
+        return bool(self.packedlut()[v2,v1>>3]>>(v1&7)&1)
+
+    def mask(self, v1, v2):
+        """
+        returns boolean mask of events inside the gate, for arrays of raw
+        adc values v1 (x) and v2 (y), by one gather from the packed table
+        """
+        v1=np.asarray(v1)
+        v2=np.asarray(v2)
+        bits=self.packedlut()[v2,v1>>3]>>(v1&7).astype(np.uint8)
+        return (bits&1).view(bool)
+
+    def columns(self):
+        if self.adc1 is None:
+            raise ValueError("adcs of gate %s are not set"%(self.name,))
+        return {self.adc1,self.adc2}
+
+    def tablemask(self, table, masks=None):
+        """
+        returns boolean mask of the events of an EventTable inside the gate
+        """
+        self.columns()
+        return self.mask(table[self.adc1],table[self.adc2])
+
+    def accepts(self, v):
+        self.columns()
+        return self.inside(v[int(self.adc1[3])-1],v[int(self.adc2[3])-1])
+
+    def _raster(self, x, y):
+        """
+        returns boolean array [iy,ix], True where (x[ix],y[iy]) is inside
+        the polygon, by a scanline fill with the even-odd rule
+        """
+        v=np.asarray(self.vertlist,dtype=np.float64)
+        x0,y0=v[:,0],v[:,1]
+        x1,y1=np.roll(x0,-1),np.roll(y0,-1)
+        yc=y[:,None]
+        # edges crossed by each row, half open so vertices count once
+        crosses=(y0<=yc)!=(y1<=yc)
+        with np.errstate(divide='ignore',invalid='ignore'):
+            xcross=x0+(yc-y0)*(x1-x0)/(y1-y0)
+        rows,edges=np.nonzero(crosses)
+        # toggle inside/outside at first cell right of each crossing
+        cols=np.searchsorted(x,xcross[rows,edges],side='right')
+        toggles=np.zeros((len(y),len(x)+1),dtype=np.uint8)
+        np.add.at(toggles,(rows,cols),1)
+        toggles&=1
+        inside=np.bitwise_xor.accumulate(toggles,axis=1)
+        return inside[:,:-1].view(bool)
+
 class EventSource(object):
     """
     a class to encapsulate neutron daq .lst files
@@ -109,29 +848,77 @@ class EventSource(object):
     This is not documented and may be some sort of bug.
     Presently they are ignored.
 
+    Compressed list files (.lst.gz, .lst.xz, .lst.bz2) are decompressed as
+    they are read. They can not be memory mapped, and seeking in them is slow.
+
+    List archives (.h5, see archive) are read column by column in place of
+    the list data, as EventTables. They are not cached, memory mapped or
+    followed; seeking uses the tick column.
+
     Parameters
     ----------
     infile : Path 
         Full path to list file to be sorted.
+    usemmap : bool
+        If True, the list data is memory mapped and decoded in place, rather
+        than read into private buffers. The pages are shared with any other
+        process mapping or reading the same file.
+    usecache : bool
+        If True, a valid cache of the decoded events beside the list file
+        (see eventcache) is read in place of decoding the list data.
+    writecache : bool
+        If True, events decoded from the whole stream are written to a
+        cache beside the list file, for usecache. The cache takes about 13
+        bytes per event, more than the list data itself, so it is not
+        written for compressed list files.
     
     """
     
-    def __init__( self, infile ):
+    def __init__( self, infile, usemmap=False, usecache=True, writecache=False ):
         """
         initialise class instance
         infile: path to lst file
         """
-        f=open(infile,"rb",buffering=81920)
+        suffix=os.path.splitext(infile)[1].lower()
+        self.compressed=suffix in compressors
+        self.archive=None
+        if archive.isarchive(infile):
+            self.archive=archive.Archive(infile)
+            f=None
+            usemmap=usecache=False
+            self.position=0    # next event in archive
+            self.stoprow=None  # end of events to read, from set_window()
+            self.stoptick=None
+        elif self.compressed:
+            f=compressors[suffix](infile,"rb")
+        else:
+            f=open(infile,"rb",buffering=81920)
         self.filename=infile
         self.f=f
+        self.usemmap=usemmap and not self.compressed
+        self.usecache=usecache
+        self.writecache=writecache and usecache and not self.compressed
+        self.caching=False # True while decoded events are written to cache
+        self.tick0=0  # TIMER ticks before current position, after a seek
+        self.event0=0 # adc events before current position
+        self.tickperiod=TICKPERIOD
+        self.index=None
+        self.stopoffset=None # end of list data to read, from set_window()
+        self.stopped=False   # set by stop() to end follow()
+        self.payload=None
         # read header into list
-        l=[]        
-        for b in f:
-            l.append(b)
-            s=b.decode()
-            if "[LISTDATA]" in s: # marker for start of data (end of header)
-                break
-        self.header=l
+        if self.archive is not None:
+            self.header=self.archive.header
+            self.dataoffset=0
+        else:
+            l=[]        
+            for b in f:
+                l.append(b)
+                s=b.decode()
+                if "[LISTDATA]" in s: # marker for start of data (end of header)
+                    break
+            self.header=l
+            self.dataoffset=f.tell() # start of list data in file
         # we can decode header using configparser from standard python library
         C=configparser.ConfigParser(strict=False)
         # the data comes out the binary mode file as byte array per line  -- add
@@ -171,9 +958,15 @@ class EventSource(object):
             list of 4 booleans of adc status, list of 4 adc values)
         Only adcs with True status should be read out.
         """
+        if self.archive is not None:
+            yield from self._archivestream()
+            return
         f=self.f
         nunknown0=0
+        stop=None if self.stopoffset is None else self.dataoffset+self.stopoffset
         while 1:
+            if stop is not None and f.tell()>=stop:
+                return
             b=f.read(4) # read 4 byte word
             if b==b'\x00\x00\x00\x00':
                 #print("offset",f.tell())
@@ -238,6 +1031,408 @@ class EventSource(object):
                 values[i]=ints
         return Nadcs,isadc,values
 
+    def _decodeblocks(self, blocksize):
+        """
+        generator of EventTables decoded from successive blocks of the stream
+
+        Each block of blocksize bytes is read as an array, and all records in
+        it are classified and unpacked at once by the vectorized decoder.
+        An incomplete record at the end of a block is carried to the next;
+        one at the end of the file is dropped.
+        """
+        writer=None
+        if self.writecache and self.f.tell()==self.dataoffset \
+           and self.stopoffset is None:
+            try:
+                writer=eventcache.CacheWriter(self.filename,self.header)
+            except OSError:
+                pass # no cache if directory is not writable
+        self.caching=writer is not None
+        try:
+            for t in self._readblocks(blocksize):
+                if writer is not None:
+                    try:
+                        writer.append(t.columns)
+                    except OSError: # a failed cache must not stop the sort
+                        writer.abort()
+                        writer=None
+                        self.caching=False
+                yield t
+            if writer is not None:
+                try:
+                    writer.commit(self.counts)
+                except OSError:
+                    writer.abort()
+                writer=None
+        finally:
+            # stream not read to the end
+            self.caching=False
+            if writer is not None:
+                writer.abort()
+
+    def _readblocks(self, blocksize, marks=None):
+        """
+        generator of EventTables decoded from successive blocks of the stream,
+        with positions of marks as for decodebuffer(), but with offsets from
+        the start of the list data and counts from the start of the run.
+        At the end, self.decoded is the offset of the end of the last record.
+        """
+        f=self.f
+        ntimer=self.tick0
+        nevent=self.event0
+        self.counts=newcounts()
+        if self.usemmap:
+            # decode in place; an incomplete record is carried by offset
+            payload=np.asarray(self.get_payload())[:self.stopoffset]
+            pos=f.tell()-self.dataoffset
+            while pos<len(payload):
+                t,n=decodebuffer(payload[pos:pos+blocksize],self.adcmasks,ntimer,
+                                 marks=marks)
+                if n==0:
+                    break
+                if marks is not None:
+                    for a in t.positions.values(): a+=(pos,0,nevent)
+                pos+=n
+                f.seek(self.dataoffset+pos)
+                ntimer+=t.counts[TIMER]
+                nevent+=len(t)
+                addcounts(self.counts,t.counts)
+                yield t
+            self.decoded=pos
+        else:
+            rest=b''
+            while 1:
+                pos=f.tell()-len(rest)-self.dataoffset
+                if self.stopoffset is not None:
+                    blocksize=min(blocksize,self.stopoffset-pos-len(rest))
+                b=f.read(max(blocksize,0))
+                if len(b)==0:
+                    break
+                raw=np.frombuffer(rest+b,dtype=np.uint8)
+                t,n=decodebuffer(raw,self.adcmasks,ntimer,marks=marks)
+                if marks is not None:
+                    for a in t.positions.values(): a+=(pos,0,nevent)
+                rest=raw[n:].tobytes()
+                ntimer+=t.counts[TIMER]
+                nevent+=len(t)
+                addcounts(self.counts,t.counts)
+                yield t
+            self.decoded=f.tell()-len(rest)-self.dataoffset
+
+    def follow(self, poll=1.0, idle=None, blocksize=BLOCKSIZE):
+        """
+        generator of EventTables decoded from a list file still being written
+
+        When the end of the file is reached, the file is polled every poll
+        seconds, and only the bytes added since are decoded. An incomplete
+        record at the end of the file is kept until the rest is written.
+        Ends when stop() is called, or after idle seconds without new data
+        if idle is given. Counts of records decoded so far are in
+        self.counts. Neither the cache nor the memory map are used.
+        Archives, compressed files and a stream with an end set by
+        set_window() can not be followed.
+        """
+        if self.archive is not None:
+            raise ValueError("archives can not be followed")
+        if self.compressed:
+            raise ValueError("compressed list files can not be followed")
+        if self.stopoffset is not None:
+            raise ValueError("a list file can not be followed to the end of a time window")
+        f=self.f
+        ntimer=self.tick0
+        self.counts=newcounts()
+        self.stopped=False
+        rest=b''
+        lastdata=time.monotonic()
+        while not self.stopped:
+            b=f.read(blocksize)
+            if len(b)==0:
+                if idle is not None and time.monotonic()-lastdata>idle:
+                    break
+                time.sleep(poll)
+                continue
+            lastdata=time.monotonic()
+            raw=np.frombuffer(rest+b,dtype=np.uint8)
+            t,n=decodebuffer(raw,self.adcmasks,ntimer)
+            rest=raw[n:].tobytes()
+            ntimer+=t.counts[TIMER]
+            addcounts(self.counts,t.counts)
+            if len(t)>0:
+                yield t
+
+    def stop(self):
+        """
+        end follow() at its next poll
+        """
+        self.stopped=True
+
+    def eventbatches(self, batchsize=BATCHSIZE, columns=None):
+        """
+        generator of EventTables of batchsize adc events; the last may be
+        shorter
+
+        The stream is decoded in blocks of batchsize words, so memory use
+        is set by batchsize and not by the size of the file. Ticks count
+        from the start of the run, also after seek_time() or seek_event().
+        Counts of records decoded so far are in self.counts.
+        For archives, only the columns named are read, with the bitmap;
+        list data is always decoded in full.
+        """
+        if self.archive is not None:
+            yield from self._archivebatches(batchsize,columns)
+            return
+        table=self._cachedtable()
+        if table is not None:
+            for i in range(0,len(table),batchsize):
+                yield table.filter(slice(i,i+batchsize))
+            return
+        pending=[]
+        npending=0
+        for t in self._decodeblocks(4*batchsize):
+            pending.append(t)
+            npending+=len(t)
+            if npending>=batchsize:
+                t=EventTable.concatenate(pending)
+                for i in range(0,npending-batchsize+1,batchsize):
+                    yield t.filter(slice(i,i+batchsize))
+                npending-=i+batchsize
+                pending=[t.filter(slice(i+batchsize,None))]
+        if npending>0:
+            yield EventTable.concatenate(pending)
+
+    def to_table(self, blocksize=BLOCKSIZE, columns=None):
+        """
+        decode the rest of the event stream into an EventTable
+
+        The events are the same as the adc events from eventstream().
+        Counts of the other records are in the counts of the table.
+        For archives, only the columns named are read, as eventbatches().
+        """
+        if self.archive is not None:
+            table=EventTable.concatenate(list(self._archivebatches(
+                max(self.archive.nevents,1),columns)))
+            table.counts=dict(self.counts)
+            return table
+        table=self._cachedtable()
+        if table is not None:
+            return table
+        table=EventTable.concatenate(list(self._decodeblocks(blocksize)))
+        table.counts=dict(self.counts)
+        return table
+
+    def _archivebatches(self, batchsize, columns):
+        """
+        generator of EventTables read from an archive, from the current
+        position to the end of the window
+        """
+        A=self.archive
+        stop=A.nevents if self.stoprow is None else self.stoprow
+        self.counts=A.counts(self.tick0,self.stoptick)
+        while self.position<stop:
+            n=min(batchsize,stop-self.position)
+            t=EventTable(A.read(self.position,self.position+n,columns))
+            self.position+=n
+            yield t
+
+    def _archivestream(self):
+        """
+        event stream from an archive, as eventstream(). TIMER records are
+        made from the tick column, with their adc active bits; SYNCHRON and
+        RTC records come before the events of their tick.
+        """
+        A=self.archive
+        stoptick=A.nticks if self.stoptick is None else self.stoptick
+        bits=A.timerbits(0,stoptick).tolist()
+        nsync=np.bincount(A.recordticks('synchron'),minlength=A.nticks+1).tolist()
+        nrtc=np.bincount(A.recordticks('rtc'),minlength=A.nticks+1).tolist()
+        ntick=self.tick0
+        for t in self._archivebatches(BATCHSIZE,None):
+            for b,v,tick in zip(t['bitmap'].tolist(),t.values().tolist(),
+                                t['tick'].tolist()):
+                while ntick<tick:
+                    for i in range(nsync[ntick]): yield SYNCHRON,0,0,0
+                    for i in range(nrtc[ntick]): yield RTC,0,0,0
+                    yield TIMER,bits[ntick],0,0
+                    ntick+=1
+                yield ADCEVENT,int(_nadcs[b]),b,v
+        while ntick<stoptick:
+            for i in range(nsync[ntick]): yield SYNCHRON,0,0,0
+            for i in range(nrtc[ntick]): yield RTC,0,0,0
+            yield TIMER,bits[ntick],0,0
+            ntick+=1
+        if self.stoptick is None: # records after the last TIMER
+            for i in range(nsync[ntick]): yield SYNCHRON,0,0,0
+            for i in range(nrtc[ntick]): yield RTC,0,0,0
+
+    def _cachedtable(self):
+        """
+        returns EventTable of memory mapped columns from a valid cache, if the
+        stream is at the start of the list data; otherwise None
+        """
+        if not self.usecache or self.f.tell()!=self.dataoffset \
+           or self.stopoffset is not None:
+            return None
+        cached=eventcache.load(self.filename,self.header)
+        if cached is None:
+            return None
+        columns,counts=cached
+        self.f.seek(0,os.SEEK_END) # stream is consumed
+        self.counts=counts
+        return EventTable(columns,dict(counts))
+
+    def decode(self, blocksize=BLOCKSIZE):
+        """
+        decode the rest of the event stream with the vectorized decoder
+
+        Returns
+        -------
+            bitmap:  uint8 array of adc bitmaps, one per adc event
+            values:  (n,4) uint16 array of adc values, zero if adc not fired
+        """
+        table=self.to_table(blocksize)
+        return table['bitmap'],table.values()
+
+    def get_index(self, step=DEFAULTSTEP):
+        """
+        returns EventIndex of the list data, loaded from beside the list file
+        or else built in one pass and saved there. The index is kept until
+        the file is closed. Building leaves the stream at the end of the data.
+        Archives have no index; they are searched by tick.
+        """
+        if self.archive is not None:
+            raise ValueError("archives have no index")
+        if self.index is None:
+            index=EventIndex.load(self.filename,self.header)
+            if index is None or index.step!=step:
+                index=EventIndex.build(self,step)
+                try:
+                    index.save(self.filename,self.header)
+                except OSError:
+                    pass # keep in memory only
+            self.index=index
+        return self.index
+
+    def _seekentry(self, entry):
+        """
+        position stream at a record boundary given by an index entry of
+        byte offset, TIMER records before and adc events before
+        """
+        offset,tick,event=(int(x) for x in entry)
+        self.f.seek(self.dataoffset+offset)
+        self.tick0=tick
+        self.event0=event
+
+    def _scanto(self, entry, kind, column, value):
+        """
+        scan forward from an index entry to the first record of a type with
+        column of its entry at least value; returns its entry, or None
+        """
+        self._seekentry(entry)
+        for t in self._readblocks(1<<20,marks=(kind,)):
+            a=t.positions[kind]
+            i=np.searchsorted(a[:,column],value)
+            if i<len(a):
+                return a[i]
+        return None
+
+    def seek_time(self, ms):
+        """
+        position stream after the TIMER ticks of the first ms milliseconds
+        of the run, so that the first events decoded have tick ms/tickperiod.
+
+        The tick period is self.tickperiod, 1 ms by default; the timer
+        reduction factor in the header is not applied. Uses the index of
+        get_index(). Raises ValueError if the run is shorter.
+        """
+        tick=int(ms/self.tickperiod)
+        if self.archive is not None:
+            if tick>self.archive.nticks:
+                raise ValueError("time beyond end of run")
+            self.position=self.event0=self.archive.tickrow(tick)
+            self.tick0=tick
+            return
+        e=self._timeentry(tick)
+        if e is None:
+            raise ValueError("time beyond end of run")
+        self._seekentry(e)
+
+    def _timeentry(self, tick):
+        """
+        returns entry for the position after tick TIMER records, or None if
+        the run is shorter. The stream is moved.
+        """
+        index=self.get_index()
+        if tick==0:
+            return (0,0,0)
+        if tick>index.end[1]:
+            return None
+        # find TIMER record ending tick tick-1
+        e=self._scanto(index.entry(1,tick-1),TIMER,1,tick-1)
+        if e is None: # beyond a window set by set_window()
+            return None
+        return (e[0]+4,tick,e[2])
+
+    def set_window(self, t1=None, t2=None):
+        """
+        limit the stream to the run time window t1<=t<t2 in ms, so only
+        events with tick from t1/tickperiod up to t2/tickperiod are read.
+        Either limit may be None, for the start or end of the run.
+        The stream is positioned at t1, with seek_time(); list data after
+        t2 is never read.
+        """
+        if self.archive is not None:
+            self.stoprow=self.stoptick=None
+            tick=None if t2 is None else int(t2/self.tickperiod)
+            if tick is not None and tick<=self.archive.nticks:
+                self.stoptick=tick
+                self.stoprow=self.archive.tickrow(tick)
+            self.seek_time(0 if t1 is None else t1)
+            return
+        self.stopoffset=None
+        if t2 is not None:
+            e=self._timeentry(int(t2/self.tickperiod))
+            if e is not None:
+                self.stopoffset=int(e[0])
+        self.seek_time(0 if t1 is None else t1)
+
+    def seek_event(self, n):
+        """
+        position stream at the n-th adc event (from 0) of the run.
+        Uses the index of get_index(). Raises ValueError if there are
+        not enough events.
+        """
+        if self.archive is not None:
+            if n>=self.archive.nevents:
+                raise ValueError("event beyond end of run")
+            self.position=self.event0=n
+            self.tick0=int(self.archive.events['tick'][n])
+            return
+        index=self.get_index()
+        if n>=index.end[2]:
+            raise ValueError("event beyond end of run")
+        e=self._scanto(index.entry(2,n),0,2,n)
+        self._seekentry(e)
+
+    def get_payload(self):
+        """
+        returns the list data (after the header) as a read-only memory map
+
+        The numpy.memmap is uint8, and supports the buffer protocol, so a
+        memoryview or other array views may be taken without copying.
+        The map is made on first use and kept until the file is closed.
+        Compressed files can not be mapped.
+        """
+        if self.compressed or self.archive is not None:
+            raise ValueError("compressed list data can not be memory mapped")
+        if self.payload is None:
+            size=os.path.getsize(self.filename)-self.dataoffset
+            if size>0:
+                self.payload=np.memmap(self.filename,dtype=np.uint8,mode='r',
+                                       offset=self.dataoffset)
+            else:
+                self.payload=np.zeros(0,dtype=np.uint8)
+        return self.payload
+
     def get_header(self):
         return self.header
 
@@ -248,12 +1443,38 @@ class EventSource(object):
         return self.configdata
 
     def closeFile(self):
+        if self.archive is not None:
+            self.archive.close()
         if self.f:
             self.f.close()
             #print("file closed")
         self.f=0
+        self.payload=None # map is released when no views remain
+        self.index=None
         
 
+def _shift(divisor):
+    """
+    returns log2 of divisor if it is a power of two, else None
+    """
+    if divisor>0 and divisor&(divisor-1)==0:
+        return divisor.bit_length()-1
+    return None
+
+def _channels(values,divisor,shift):
+    """
+    returns histogram channels of adc values as intp, by shift if possible
+    """
+    values=np.asarray(values).astype(np.intp,copy=False)
+    if shift is not None:
+        return values>>shift
+    return values//divisor
+
+def _weights(h,weights):
+    if weights is not None and h.data.dtype.kind!='f':
+        raise ValueError("weights need a float histogram: "+str(h.label))
+    return weights
+
 class Histogram(object):
     """
     Create a 1-d or 2-d histogram
@@ -276,15 +1497,30 @@ class Histogram(object):
         calib:     Calibration for calculated parameters. 
                    A tuple, (m,label) where m is slope in ,unit./ch and
                    label is used for x - axis (e.g. "E_n [MeV]")
+        dtype:     Storage type of counts: uint32 (default), uint64 for very
+                   long runs, or a float type for weighted histograms.
+                   fill() and fill2() raise OverflowError rather than let an
+                   integer channel wrap around.
+        sparse:    If True, store a 2-d histogram as a BlockedCounts, which
+                   keeps only blocks of the matrix holding counts. Use for
+                   large matrices, e.g. 8192x8192; numpy.asarray(data) or
+                   dense() gives the dense array for plotting or export.
+        gate:      Gate, or gate expression such as 'neutrons & ~pileup'
+                   of names in gatelist; only events inside are counted
 
     Returns
     -------
         data:      reference to data array (numpy)
         yl,xl:     adc names from histogram creation (for plot labels)
     """
-    def __init__(self, stream, group, adctuple, sizetuple, label=None, calib=None):
+    def __init__(self, stream, group, adctuple, sizetuple, label=None, calib=None,
+                 dtype=np.uint32, sparse=False, gate=None):
         self.coincidencegroup=group
+        self.gate=gate
         self.label=label
+        self.timing=None # dead time of sort, from livetime()
+        self.generation=0 # incremented when counts change; odd while changing
+        self._snapshot=None
         self.calib=calib
         if label is None:
             labeltuple=adctuple
@@ -314,8 +1550,9 @@ class Histogram(object):
             else:
                 self.adcrange1=sizetuple[0]
             self.divisor1 = self.adcrange1//sizetuple[0]
+            self.shift1=_shift(self.divisor1)
             self.index1=int(adctuple[0][3])-1
-            self.data=np.zeros(sizetuple[0])
+            self.data=np.zeros(sizetuple[0],dtype=dtype)
         elif len(adctuple)==2:
             if self.label is None: self.label=labeltuple[0]+"v"+labeltuple[1]
             self.dims=2
@@ -329,16 +1566,24 @@ class Histogram(object):
             self.adcrange2=C.getint(adctuple[1],'range')
             self.divisor1 = self.adcrange1//sizetuple[0]
             self.divisor2 = self.adcrange2//sizetuple[1]
+            self.shift1=_shift(self.divisor1)
+            self.shift2=_shift(self.divisor2)
             self.index1=int(adctuple[0][3])-1
             self.index2=int(adctuple[1][3])-1
-            self.data=np.zeros(sizetuple)
-            self.gate=None
+            # data is [adc2,adc1], as for imshow()
+            shape=(self.size2,self.size1)
+            if sparse:
+                self.data=BlockedCounts(shape,dtype)
+            else:
+                self.data=np.zeros(shape,dtype=dtype)
         else:
             raise ValueError("Number of ADCs must be 1 or 2")
 
     def increment(self,v):
+        if self.gate is not None and not gateexpr(self.gate).accepts(v):
+            return
         if self.dims==1:
-            self.data[v[self.index1]//self.divisor1]+=1.0
+            self._count(v[self.index1]//self.divisor1)
         elif self.dims==2:
             i1=self.index1
             i2=self.index2
@@ -348,20 +1593,27 @@ class Histogram(object):
             d2=self.divisor2
             ix=v2//d2
             iy=v1//d1
-            self.data[ix,iy]+=1.0
-            if self.gate is not None:
-                gatelist[self.gate].ingate=gatelist[self.gate].gatearray[ix,iy]
-                
+            self._count((ix,iy))
+
+    def _count(self,index):
+        """
+        Add one count to a channel, raising OverflowError rather than let
+        an integer channel wrap around
+        """
+        data=self.data
+        if data.dtype.kind in 'ui' and data[index]>=np.iinfo(data.dtype).max:
+            raise OverflowError("histogram %s overflows %s"%(self.label,data.dtype))
+        data[index]+=1
+        self.generation+=2
 
     def increment1(self,v):
         if self.dims==1:
-            self.data[v//self.divisor1]+=1.0
+            self._count(v//self.divisor1)
         elif self.dims==2:
             # Error
             pass
         
     def increment2(self,v1,v2):
-        ingate=True
         if self.dims==1:
             # Error
             pass
@@ -370,46 +1622,438 @@ class Histogram(object):
             d2=self.divisor2
             ix=v2//d2
             iy=v1//d1
-            self.data[ix,iy]+=1.0
-            ingate=True
-            if self.gate is not None:
-                ingate=self.gate.gatearray[ix,iy]
-                self.gate.ingate=ingate
-        return ingate
-        
+            self._count((ix,iy))
+
+    def __getstate__(self):
+        # the event source is not needed to fill a copy in another process
+        state=self.__dict__.copy()
+        state['S']=None
+        state['_snapshot']=None
+        return state
+
+    def add(self,counts):
+        """
+        Add an array of counts of the shape of data. Raises OverflowError if
+        a channel of an integer histogram would exceed its dtype.
+        """
+        if isinstance(self.data,BlockedCounts):
+            self.generation+=1
+            try:
+                self.data.add(counts)
+            except OverflowError:
+                raise OverflowError("histogram %s overflows %s"%(self.label,
+                                                                  self.data.dtype))
+            finally:
+                self.generation+=1
+            return
+        if self.data.dtype.kind in 'ui' and counts.size>0:
+            limit=np.iinfo(self.data.dtype).max
+            if int(counts.max())>limit-int(self.data.max()) and \
+               np.any(counts>limit-self.data):
+                raise OverflowError("histogram %s overflows %s"%(self.label,
+                                                                  self.data.dtype))
+        self.generation+=1
+        self.data+=counts.astype(self.data.dtype,copy=False)
+        self.generation+=1
+
+    def fill(self,values,weights=None):
+        """
+        Increment a 1-d histogram for an array of raw adc values, by
+        weights if given (float histograms only)
+        """
+        i=_channels(values,self.divisor1,self.shift1)
+        n=len(self.data)
+        counts=np.bincount(i,weights=_weights(self,weights),minlength=n)
+        if len(counts)>n:
+            raise IndexError("adc value out of range of histogram "+self.label)
+        self.add(counts)
+
+    def fill2(self,x,y,weights=None):
+        """
+        Increment a 2-d histogram for arrays of raw adc values x (of adc1)
+        and y (of adc2), as increment2, by weights if given (float
+        histograms only)
+        """
+        ix=_channels(y,self.divisor2,self.shift2)
+        iy=_channels(x,self.divisor1,self.shift1)
+        n1,n2=self.data.shape
+        if len(ix)>0 and (ix.max()>=n1 or iy.max()>=n2):
+            raise IndexError("adc value out of range of histogram "+self.label)
+        if isinstance(self.data,BlockedCounts):
+            self.generation+=1
+            try:
+                self.data.fill(ix,iy,_weights(self,weights))
+            except OverflowError:
+                raise OverflowError("histogram %s overflows %s"%(self.label,
+                                                                  self.data.dtype))
+            finally:
+                self.generation+=1
+            return
+        flat=ix*n2+iy
+        counts=np.bincount(flat,weights=_weights(self,weights),minlength=n1*n2)
+        self.add(counts.reshape(n1,n2))
+
+    def clear(self):
+        """
+        set all counts to zero, keeping the storage type
+        """
+        if isinstance(self.data,BlockedCounts):
+            self.data=self.data.empty()
+        else:
+            self.data=np.zeros_like(self.data)
+        self.generation+=2
+
+    def dense(self):
+        """
+        returns the counts as a dense numpy array
+        """
+        return np.asarray(self.data)
+
+    def rebinned(self,factor):
+        """
+        returns a HistogramView of this histogram with factor channels
+        summed into one; for 2-d, factor may be a tuple (x,y)
+        """
+        return HistogramView(self,factor=factor)
+
+    def projection(self,adc,band=None):
+        """
+        returns a HistogramView of a 2-d histogram projected onto adc (its
+        adc1 or adc2), summing channels lo<=i<hi of the other adc if
+        band=(lo,hi) is given
+        """
+        return HistogramView(self,project=adc,band=band)
+
+    def incrementbatch(self,table,masks=None):
+        """
+        Increment for the events of an EventTable inside the gate, if any.
+        The table should already be selected for the coincidence group;
+        masks is a GateMasks of the table, to share masks of gates.
+        """
+        if self.gate is not None:
+            if masks is None:
+                masks=GateMasks(table)
+            table=table.filter(masks(self.gate))
+        if self.dims==1:
+            self.fill(table[self.adc1])
+        elif self.dims==2:
+            self.fill2(table[self.adc1],table[self.adc2])
+
+    def snapshot(self):
+        """
+        returns a dense copy of the counts which is never torn by a sort
+        in another thread. The sorter does not wait for readers: the
+        generation is odd while counts are being changed, and the copy is
+        made again if the generation changed while it was being made.
+        The copy is reused until the counts change.
+        """
+        while True:
+            g=self.generation
+            snap=self._snapshot
+            if snap is not None and snap[0]==g:
+                return snap[1]
+            if g&1==0:
+                try:
+                    data=np.array(self.data)
+                except RuntimeError: # blocks of sparse counts added meanwhile
+                    data=None
+                if data is not None and self.generation==g:
+                    self._snapshot=(g,data)
+                    return data
+            time.sleep(0)
 
     def get_plotdata(self):
         if self.dims==1:
-            return self.data, self.adc1, 'x'
+            return self.snapshot(), self.adc1, 'x'
         else:
-            return self.data, self.adc1, self.adc2
+            return self.snapshot(), self.adc1, self.adc2
 
     def get_plotlabels(self):
         if self.dims==1:
-            return self.data, self.label1, 'x'
+            return self.snapshot(), self.label1, 'x'
         else:
-            return self.data, self.label1, self.label2
+            return self.snapshot(), self.label1, self.label2
 
     def set_gate(self,gate):
+        """
+        Count only events inside gate: a Gate, a gate expression such as
+        'neutrons & ~pileup' of names in gatelist, or None for all events
+        """
         self.gate=gate
 
+def _project(data,axis,lo,hi):
+    """
+    returns sum of 2-d counts over axis for indices lo<=i<hi of that axis
+    """
+    if isinstance(data,BlockedCounts):
+        return data.project(axis,lo,hi)
+    if axis==0:
+        return data[lo:hi].sum(axis=0,dtype=data.dtype)
+    return data[:,lo:hi].sum(axis=1,dtype=data.dtype)
+
+def _rebin(data,factors):
+    """
+    returns counts summed over blocks of factors channels
+    """
+    if isinstance(data,BlockedCounts):
+        return data.rebin(*factors)
+    shape=[]
+    for n,f in zip(data.shape,factors):
+        if n%f:
+            raise ValueError("rebin factor %d does not divide size %d"%(f,n))
+        shape+=[n//f,f]
+    return data.reshape(shape).sum(axis=tuple(range(1,len(shape),2)),
+                                   dtype=data.dtype)
+
+class HistogramView(Histogram):
+    """
+    Read-only view of a master Histogram with coarser binning, or a 1-d
+    projection of a 2-d master, computed on demand and cached until the
+    counts of the master change. Sort into the master at full resolution
+    and look at it in any binning without sorting again.
+
+    Parameters
+    ----------
+        master:    Histogram
+        factor:    number of master channels per view channel; for 2-d,
+                   a tuple (x,y)
+        project:   for a 2-d master, adc (master.adc1 or master.adc2) to
+                   project onto
+        band:      (lo,hi) range of master channels of the other adc to sum
+                   in a projection; all if None
+    """
+    def __init__(self, master, factor=1, project=None, band=None):
+        self.master=master
+        self.coincidencegroup=master.coincidencegroup
+        self.S=None
+        self.gate=None
+        self.calib=None
+        self._cache=(None,None)
+        m=master
+        if project is not None:
+            if m.dims!=2 or project not in (m.adc1,m.adc2):
+                raise ValueError("projection needs a 2-d histogram of "+str(project))
+            n=1 if project==m.adc1 else 2
+            other=2 if n==1 else 1
+            self.dims=1
+            self.adc1=project
+            for a in ('size','adcrange','divisor','shift','index','label'):
+                setattr(self,a+'1',getattr(m,a+str(n)))
+            lo,hi=band if band is not None else (0,getattr(m,'size%d'%other))
+            self.label=self.label1+" of "+str(m.label)
+            if band is not None:
+                self.label+=" [%d,%d)"%(lo,hi)
+            # data is [adc2,adc1]: sum rows to project onto adc1
+            self._projection=(0 if n==1 else 1,lo,hi)
+            return
+        self.dims=m.dims
+        factors=factor if isinstance(factor,tuple) else (factor,)*m.dims
+        self.label=m.label
+        if m.calib is not None:
+            self.calib=(m.calib[0]*factors[0],m.calib[1])
+        for i,f in enumerate(factors,1):
+            for a in ('adc','adcrange','index','label'):
+                if hasattr(m,a+str(i)):
+                    setattr(self,a+str(i),getattr(m,a+str(i)))
+            setattr(self,'size%d'%i,getattr(m,'size%d'%i)//f)
+            setattr(self,'divisor%d'%i,getattr(m,'divisor%d'%i)*f)
+            setattr(self,'shift%d'%i,_shift(getattr(self,'divisor%d'%i)))
+        self._projection=None
+        # data is [adc2,adc1]
+        self._factors=factors[::-1]
+
+    @property
+    def data(self):
+        """
+        counts reduced from the master as in Histogram.snapshot(): from
+        its counts in place, tagged with the generation they were read at,
+        and read again if a sort changed them meanwhile
+        """
+        m=self.master
+        while True:
+            generation,data=self._cache
+            g=m.generation
+            if data is not None and generation==g:
+                return data
+            if g&1==0:
+                try:
+                    data=self._reduce(m.data)
+                except RuntimeError: # blocks of sparse counts added meanwhile
+                    data=None
+                if data is not None and m.generation==g:
+                    self._cache=(g,data)
+                    return data
+            time.sleep(0)
+
+    def snapshot(self):
+        return self.data
+
+    @property
+    def timing(self):
+        return self.master.timing
+
+    @property
+    def generation(self):
+        return self.master.generation
+
+    def _reduce(self,data):
+        if self._projection is not None:
+            return _project(data,*self._projection)
+        return _rebin(data,self._factors)
+
+    def add(self,counts):
+        raise TypeError("histogram view is read only")
+
+class HistogramBank(object):
+    """
+    Dense histograms of one coincidence group kept in one contiguous array
+    and filled together from each batch of events.
+    Channels of each adc column are computed once per divisor, however many
+    histograms use them, and released after the last histogram using them.
+    Histograms with the same adcs and binning, e.g. a gated copy, are
+    counted once per batch.
+
+    The data of each histogram becomes a view into the bank, holding the
+    counts it had, so the histograms are used as before.
+
+    Parameters
+    ----------
+        histlist:  histograms to bank; all dense, with the same dtype
+    """
+    def __init__(self, histlist):
+        dtypes={h.data.dtype for h in histlist}
+        if len(dtypes)!=1 or any(not isinstance(h.data,np.ndarray) for h in histlist):
+            raise ValueError("banked histograms must be dense with one dtype")
+        self.histlist=list(histlist)
+        self.offsets=np.cumsum([0]+[h.data.size for h in histlist])
+        self.buffer=np.zeros(self.offsets[-1],dtype=dtypes.pop())
+        self.views=[]
+        for h,o in zip(self.histlist,self.offsets):
+            v=self.buffer[o:o+h.data.size].reshape(h.data.shape)
+            v[...]=h.data
+            h.data=v
+            self.views.append(v)
+        # last histogram using each adc column and divisor, after which the
+        # channels of the column are released
+        self.columns=[[(h.adc1,h.divisor1)]+
+                      ([(h.adc2,h.divisor2)] if h.dims==2 else [])
+                      for h in self.histlist]
+        self.lastuse={col:k for k,cols in enumerate(self.columns) for col in cols}
+
+    def valid(self):
+        """
+        returns False if the data of a histogram has been replaced
+        """
+        return all(h.data is v for h,v in zip(self.histlist,self.views))
+
+    def fill(self, table):
+        """
+        Increment all histograms for the events of an EventTable, which
+        should already be selected for the coincidence group
+        """
+        n=len(table)
+        if n==0:
+            return
+        channels={}
+        def chan(name,divisor,shift):
+            if (name,divisor) not in channels:
+                channels[name,divisor]=_channels(table[name],divisor,shift)
+            return channels[name,divisor]
+        counts={}
+        for k,(h,v) in enumerate(zip(self.histlist,self.views)):
+            if h.dims==1:
+                key=(h.adc1,h.divisor1,v.shape)
+                if key not in counts:
+                    counts[key]=np.bincount(chan(h.adc1,h.divisor1,h.shift1),
+                                            minlength=v.size)
+                    if len(counts[key])>v.size:
+                        raise IndexError("adc value out of range of histogram "+h.label)
+            else:
+                key=(h.adc1,h.divisor1,h.adc2,h.divisor2,v.shape)
+                if key not in counts:
+                    n1,n2=v.shape
+                    ix=chan(h.adc2,h.divisor2,h.shift2)
+                    iy=chan(h.adc1,h.divisor1,h.shift1)
+                    if ix.max()>=n1 or iy.max()>=n2:
+                        raise IndexError("adc value out of range of histogram "+h.label)
+                    flat=ix*n2
+                    flat+=iy
+                    counts[key]=np.bincount(flat,minlength=v.size)
+            for col in self.columns[k]:
+                if self.lastuse[col]==k:
+                    channels.pop(col,None)
+            c=counts[key].reshape(v.shape)
+            if v.dtype.kind in 'ui':
+                limit=np.iinfo(v.dtype).max
+                if n>limit-int(v.max()) and np.any(c>limit-v):
+                    raise OverflowError("histogram %s overflows %s"%(h.label,v.dtype))
+            h.generation+=1
+            v+=c.astype(v.dtype,copy=False)
+            h.generation+=1
+
 class Sorter(object):
     """
     Sort an eventstream into histograms
     Input:
         stream:     EventStream instance.
         histlist:   List of histograms to sort into.
-        gatelist:   List of gates to apply to events (IGNORED FOR NOW).
+        gatelist:   Dict of named gates, for gate expressions of histograms
+                    sorted in worker processes; the module gatelist if None.
+        maxcount:   Stop after this many adc events.
+        window:     Tuple (t1,t2) of run time in ms; only events in
+                    t1<=t<t2 are sorted. Either may be None. The stream is
+                    positioned here, so ValueError is raised if t1 is
+                    beyond the end of the run.
+        batchsize:  If given, decode and sort the stream in batches of this
+                    many events rather than event by event. Not used if
+                    an extra sorter is set, unless it sorts batches.
+        follow:     If True, keep sorting a list file which is still being
+                    written, polling every poll seconds for new data, until
+                    stop() is called or for idle seconds if idle is given.
+                    Not for archives or compressed files, or with a window
+                    ending at t2: ValueError is raised.
+        workers:    If more than 1, sort segments of the stream in this many
+                    processes, in batches, and sum the histograms. Not used
+                    if an extra sorter or maxcount is set, events are
+                    kept, or the list file is compressed or an archive.
+        keep:       If True, keep the events sorted, for replay() when
+                    gates change. The sort is then made in batches. Events
+                    read from or written to the event cache of the list
+                    file are memory mapped from it; others are kept in
+                    memory, up to MAXKEPT bytes, beyond which none are kept.
+    Histograms with a gate are filled from the events of each batch inside
+    it. Masks of gates are evaluated once per batch and coincidence group,
+    and shared by all histograms using them.
     """
-    def __init__( self, stream, histlist, gatelist=None, maxcount=None ):
+    def __init__( self, stream, histlist, gatelist=None, maxcount=None,
+                  batchsize=None, window=None, workers=None,
+                  follow=False, poll=1.0, idle=None, keep=False ):
+        if follow and (stream.archive is not None or stream.compressed or
+                       (window is not None and window[1] is not None)):
+            raise ValueError("can not follow an archive, a compressed file or a window with an end")
+        if window is not None:
+            stream.set_window(*window)
         self.stream = stream
+        self.follow = follow
+        self.poll = poll
+        self.idle = idle
+        self.workers = workers
+        self.window = window
+        self.batchsize = batchsize
         self.histlist = histlist
         self.morehist = None
         self.gatelist = gatelist
         self._groups=[]
         self._hists=[]
+        self._banks=None
         self.moresort=None
+        self.morebatch=False
+        self.moregate=None
+        self.kept=[] if keep else None
+        self._keptbytes=0
+        self._keptcached=False # events left in the cache being written
         self.maxcount=maxcount
+        self.timing=None
         for h in histlist:
             if h.coincidencegroup in self._groups:
                 i=self._groups.index(h.coincidencegroup)
@@ -423,6 +2067,17 @@ class Sorter(object):
         start sorting event stream.
         eventually will run in background.
         """
+        if self.follow:
+            return self.sortfollow()
+        if self.workers is not None and self.workers>1 and \
+           self.moresort is None and self.maxcount is None and \
+           self.kept is None and \
+           not self.stream.compressed and self.stream.archive is None:
+            return self.sortparallel()
+        if (self.batchsize is not None or self.kept is not None) and \
+           (self.moresort is None or self.morebatch):
+            return self.sortbatches()
+        self.kept=None # events are not kept event by event
         eventstream=self.stream.eventstream()
         #histlist=self.histlist
         # collect stats
@@ -436,11 +2091,13 @@ class Sorter(object):
         nunknown2=0
         nadc=[0,0,0,0]
         sortadc=[]
+        busy=np.zeros(TOTALADCS,dtype=np.int64)
         t0=time.perf_counter()
         for t,n,a,v in eventstream:
             #print(t,n,a,v)
             if t == TIMER:
                 ntimer+=1
+                if n&15: busy+=_bits[n&15]
             elif t == RTC:
                 nrtc+=1
             elif t == SYNCHRON:
@@ -474,13 +2131,272 @@ class Sorter(object):
         #print("Nadc",nadc,nadc[0]+nadc[1]+nadc[2]+nadc[3])
         #print("unknown1",nunknown1)
         #print("unknown2",nunknown2)
-        self.stream.closeFile() # close event stream
+        self.stream.counts={TIMER:ntimer,SYNCHRON:nmark,RTC:nrtc,'busy':busy}
+        self.finish()
         #print("file closed")
         return sortadc
 
-    def setExtraSorter( self, sorter, histlist):
+    def finish(self):
+        """
+        set dead time of sort from stream counts on the histograms, as
+        from livetime(), and close event stream.
+        """
+        self.timing=livetime(self.stream.counts,self.stream.tickperiod)
+        for h in self.histlist+(self.morehist or []):
+            h.timing=self.timing
+        E=self.stream
+        if self.kept is not None and E.usecache and self.maxcount is None and \
+           self.window is None and not self.follow:
+            # whole file sorted: map kept events from the event cache
+            cached=eventcache.load(E.filename,E.header)
+            if cached is not None:
+                self.kept=[EventTable(cached[0]).project(adcnames)]
+            elif self._keptcached:
+                self.kept=None # cache not written, events not kept
+        E.closeFile() # close event stream
+
+    def columns(self):
+        """
+        returns names of event columns needed by the histograms and their
+        gates; None (all) if there is an extra sorter or events are kept
+        """
+        if self.moresort is not None or self.kept is not None:
+            return None
+        names={h.adc1 for h in self.histlist}
+        names|={h.adc2 for h in self.histlist if h.dims==2}
+        for h in self.histlist:
+            if h.gate is not None:
+                names|=gateexpr(h.gate).columns()
+        return sorted(names&set(EventTable.columnnames))
+
+    def _makebanks(self):
+        """
+        returns, for each coincidence group, a list of (gate, HistogramBanks
+        by dtype) of its dense histograms, and a list of the other histograms
+        """
+        banks=[]
+        for histlist in self._hists:
+            bygate={}
+            others=[]
+            for h in histlist:
+                if isinstance(h.data,np.ndarray):
+                    bydtype=bygate.setdefault(h.gate,{})
+                    bydtype.setdefault(h.data.dtype,[]).append(h)
+                else:
+                    others.append(h)
+            banks.append(([(gate,[HistogramBank(hl) for hl in bydtype.values()])
+                           for gate,bydtype in bygate.items()],others))
+        return banks
+
+    def _keep(self, table):
+        """
+        keep the adc columns of a table of events, unless they are being
+        written to the event cache, to be mapped from it by finish()
+        """
+        if self.kept is None:
+            return
+        if self.stream.caching and self.maxcount is None:
+            self._keptcached=True
+            return
+        t=table.project(adcnames)
+        if not isinstance(t['bitmap'],np.memmap):
+            # copy views, which would keep all of the batch decoded alive
+            t=EventTable({k:v if v.base is None else v.copy()
+                          for k,v in t.columns.items()})
+            self._keptbytes+=sum(v.nbytes for v in t.columns.values())
+            if self._keptbytes>MAXKEPT:
+                self.kept=None # too many to keep in memory
+                return
+        self.kept.append(t)
+
+    def sortbatch(self, table):
+        """
+        sort an EventTable of adc events into the histograms
+        """
+        self._keep(table)
+        if self._banks is None or \
+           not all(b.valid() for banks,others in self._banks
+                   for gate,bl in banks for b in bl):
+            self._banks=self._makebanks()
+        for g,(banks,others) in zip(self._groups,self._banks):
+            t=table.group(g)
+            if len(t)>0:
+                masks=GateMasks(t)
+                for gate,bl in banks:
+                    tg=t if gate is None else t.filter(masks(gate))
+                    for b in bl:
+                        b.fill(tg)
+                for h in others:
+                    h.incrementbatch(t,masks)
+        if self.moresort is not None and self.morebatch:
+            self.moresort(table,self.morehist)
+
+    def sortbatches(self):
+        """
+        sort event stream in batches from EventSource.eventbatches().
+
+        Returns counts of events by bitmap, in place of the list of bitmaps
+        from the event by event sort.
+        """
+        maxcount=self.maxcount
+        nevent=0
+        bitmapcounts=np.zeros(256,dtype=np.int64)
+        batchsize=self.batchsize if self.batchsize is not None else BATCHSIZE
+        for table in self.stream.eventbatches(batchsize,self.columns()):
+            if maxcount is not None and nevent+len(table)>maxcount:
+                table=table.filter(slice(0,maxcount-nevent))
+            nevent+=len(table)
+            bitmapcounts+=np.bincount(table['bitmap'],minlength=256)
+            self.sortbatch(table)
+            if maxcount is not None and nevent>=maxcount: break
+        self.finish()
+        return bitmapcounts
+
+    def sortevents(self, table):
+        """
+        sort an EventTable event by event, as sort() does, for use with an
+        extra sorter
+        """
+        self._keep(table)
+        for a,v in zip(table['bitmap'].tolist(),table.values().tolist()):
+            if a > 0:
+                if a in self._groups:
+                    for h in self._hists[self._groups.index(a)]:
+                        h.increment(v)
+                if self.moresort is not None: self.moresort(a,v,self.morehist)
+
+    def sortfollow(self):
+        """
+        sort a list file as it is written, with EventSource.follow().
+        Histograms are incremented as each block of new data is decoded.
+
+        Returns counts of events by bitmap, as for sortbatches().
+        """
+        maxcount=self.maxcount
+        nevent=0
+        bitmapcounts=np.zeros(256,dtype=np.int64)
+        for table in self.stream.follow(self.poll,self.idle):
+            if maxcount is not None and nevent+len(table)>maxcount:
+                table=table.filter(slice(0,maxcount-nevent))
+            nevent+=len(table)
+            bitmapcounts+=np.bincount(table['bitmap'],minlength=256)
+            if self.moresort is None or self.morebatch:
+                self.sortbatch(table)
+            else:
+                self.sortevents(table)
+            if maxcount is not None and nevent>=maxcount: break
+        self.finish()
+        return bitmapcounts
+
+    def stop(self):
+        """
+        stop a sort in follow mode
+        """
+        self.stream.stop()
+
+    def sortparallel(self):
+        """
+        sort event stream in segments, each in a worker process.
+
+        The list data are split into equal byte ranges. Each range starts at
+        the first record boundary found by _syncpoint() after its nominal
+        start, and the decode of each range must end exactly at the start of
+        the next, so the histograms are the same as for a serial sort.
+        If not, the stream is sorted serially instead.
+        Returns counts of events by bitmap, as for sortbatches().
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        E=self.stream
+        gates=self.gatelist if self.gatelist is not None else gatelist
+        batchsize=self.batchsize if self.batchsize is not None else BATCHSIZE
+        if E._cachedtable() is not None:
+            # nothing to decode: sort from cache
+            E._seekentry((0,0,0))
+            return self.sortbatches()
+        start=E.f.tell()-E.dataoffset
+        stop=E.stopoffset
+        if stop is None:
+            stop=os.path.getsize(E.filename)-E.dataoffset
+        bounds=[start]
+        for i in range(1,self.workers):
+            b=(start+(stop-start)*i//self.workers)&~1
+            E.f.seek(E.dataoffset+b)
+            p=_syncpoint(np.frombuffer(E.f.read(4096),dtype=np.uint8))
+            if p is not None and bounds[-1]<b+p<stop:
+                bounds.append(b+p)
+        bounds.append(stop)
+        segments=list(zip(bounds[:-1],bounds[1:]))
+        with ProcessPoolExecutor(self.workers) as pool:
+            results=list(pool.map(_sortsegment,
+                [E.filename]*len(segments),[E.usemmap]*len(segments),
+                [self.histlist]*len(segments),bounds[:-1],bounds[1:],
+                [batchsize]*len(segments),[gates]*len(segments)))
+        if any(r[2]!=b for r,b in zip(results[:-1],bounds[1:-1])):
+            # segment boundaries are not record boundaries
+            E._seekentry((start,E.tick0,E.event0))
+            return self.sortbatches()
+        bitmapcounts=np.zeros(256,dtype=np.int64)
+        E.counts=newcounts()
+        for data,counts,decoded,reccounts in results:
+            for h,d in zip(self.histlist,data):
+                h.add(d)
+            bitmapcounts+=counts
+            addcounts(E.counts,reccounts)
+        self.finish()
+        return bitmapcounts
+
+    def setExtraSorter( self, sorter, histlist, batch=False, gate=None):
+        """
+        Set a function sorting into histlist as well: called for each adc
+        event as sorter(bitmap,values,histlist), or if batch is True for
+        each batch of events as sorter(table,histlist), with an EventTable
+        of all coincidence groups. gate is the gate the sorter applies, if
+        any, so that replay() sorts again when it changes.
+        """
         self.moresort=sorter
+        self.morebatch=batch
         self.morehist=histlist
+        self.moregate=gate
+
+    def events(self):
+        """
+        returns EventTable of the events kept by a sort with keep=True
+        """
+        if self.kept is None:
+            raise ValueError("events of sort were not kept")
+        if len(self.kept)!=1:
+            self.kept=[EventTable.concatenate(self.kept)]
+        return self.kept[0]
+
+    def replay(self, names):
+        """
+        Fill again from the kept events the histograms with gates made of
+        any of the gates named, e.g. after a gate is redrawn, and those of
+        a batch extra sorter if its gate is. Other histograms are not
+        changed.
+
+        Returns list of histograms filled.
+        """
+        names=set(names)
+        table=self.events()
+        hists=[h for h in self.histlist
+               if h.gate is not None and gateexpr(h.gate).names()&names]
+        for g,histlist in zip(self._groups,self._hists):
+            hl=[h for h in histlist if any(h is k for k in hists)]
+            if len(hl)==0:
+                continue
+            t=table.group(g)
+            masks=GateMasks(t)
+            for h in hl:
+                h.clear()
+                h.incrementbatch(t,masks)
+        if self.morebatch and self.moregate is not None and \
+           gateexpr(self.moregate).names()&names:
+            for h in self.morehist:
+                h.clear()
+            self.moresort(table,self.morehist)
+            hists+=self.morehist
+        return hists
         
         
 
@@ -8,12 +8,19 @@ from PyQt5.QtWidgets import (QWidget, QTabWidget, QVBoxLayout, QHBoxLayout,
 
 import logging
 from . import analysisdata
+from .mpafile import openmpa, scaler_names
 
 """
 Gather the file names and data needed for analysis
 """
 
-scaler_names=['sc#01','sc#02','sc#03','sc#04','sc#05','sc#06']
+def getMpaPath(pp):
+    """
+    returns path of the .mpa file for a list file, which may be compressed
+    """
+    if pp.suffix.lower() in ('.gz','.xz','.bz2'):
+        pp=pp.with_suffix('')
+    return pp.with_suffix(".mpa")
 
 class FileField(QLineEdit):
     """
@@ -38,7 +45,7 @@ class FileField(QLineEdit):
     def getFile(self):
         directory=FileField.currentpath if FileField.currentpath is not None else '.'
         directory=str(directory)
-        filename,_=Qt.QFileDialog.getOpenFileName(self,'Open file',directory,"List files (*.lst)")
+        filename,_=Qt.QFileDialog.getOpenFileName(self,'Open file',directory,"List files (*.lst *.lst.gz *.lst.xz *.lst.bz2 *.h5)")
         if filename == '': return
         pp=Path(filename)
         if pp.exists():
@@ -50,7 +57,7 @@ class FileField(QLineEdit):
             if FileField.currentpath is None or FileField.currentpath != self.parentpath:
                 FileField.currentpath=pp.parent           
             self.setText(pp.name)
-            mpapath=pp.with_suffix(".mpa")
+            mpapath=getMpaPath(pp)
             scalers=self.getScalerData(mpapath)
             self.valueChanged.emit(self.tag,pp)
 
@@ -65,7 +72,7 @@ class FileField(QLineEdit):
             if FileField.currentpath is None or FileField.currentpath != self.parentpath:
                 FileField.currentpath=pp.parent           
             self.setText(pp.name)
-            mpapath=pp.with_suffix(".mpa")
+            mpapath=getMpaPath(pp)
             scalers=self.getScalerData(mpapath)
             self.valueChanged.emit(self.tag,pp)
 
@@ -83,19 +90,10 @@ class FileField(QLineEdit):
             return None
         if self.scalers is not None:
             return self.scalers
-        f=open(filepath,"r")
-        lines=['[settings]'] # config part lacks initial header
-        for l in f:
-            if "[DATA" in l:
-                break
-            lines.append(l)
-        C=configparser.ConfigParser(strict=False,inline_comment_prefixes=(';',))
-        C.read_string(''.join(lines))
-        scalers={}
-        for i,sc in enumerate(scaler_names):
-            scdata=C.getint("MS-12 A",sc)
-            scalers[sc]=scdata
-        f.close()
+        scalers=dict(openmpa(filepath).scalers)
+        for sc in scaler_names:
+            if scalers[sc] is None:
+                raise configparser.NoOptionError(sc,"MS-12 A")
         self.scalers=scalers
         return self.scalers
 
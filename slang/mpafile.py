@@ -0,0 +1,114 @@
+import numpy as np
+import os
+import re
+import configparser
+
+"""
+Reader for the .mpa files written by MPA3 at the end of a run.
+
+An .mpa file is an INI header, with the scalers in section [MS-12 A],
+followed by spectrum blocks: a line [DATAn,length ] and then length
+integers, one per line, for the spectrum of ADCn+1. Coincidence maps are
+kept in the same way in [CDATn,length ] blocks.
+
+The header is read when the file is opened; the spectra are parsed in bulk
+when first asked for. Use openmpa() to share one reader per file: it is
+read again only if its size or modification time changes.
+"""
+
+scaler_names=['sc#01','sc#02','sc#03','sc#04','sc#05','sc#06']
+
+_block=re.compile(rb'^\[([A-Z]+)(\d+),\s*(\d+)\s*\]',re.MULTILINE)
+
+_cache={}
+
+def openmpa(path):
+    """
+    returns MpaFile for path, reusing the one already read if the file
+    is unchanged
+    """
+    path=os.path.abspath(os.fspath(path))
+    st=os.stat(path)
+    m=_cache.get(path)
+    if m is None or m.key!=(st.st_size,st.st_mtime_ns):
+        m=MpaFile(path)
+        _cache[path]=m
+    return m
+
+class MpaFile(object):
+    """
+    Header, scalers and spectra of an .mpa file
+
+    Parameters
+    ----------
+        path:      path of .mpa file
+
+    Attributes
+    ----------
+        header:    text of INI header
+        scalers:   dict of scaler values by name, e.g. 'sc#01'; None if
+                   not present
+        key:       (size, mtime) of file when read
+    """
+    def __init__(self, path):
+        self.path=os.fspath(path)
+        st=os.stat(self.path)
+        self.key=(st.st_size,st.st_mtime_ns)
+        lines=[]
+        with open(self.path,'rb') as f:
+            for l in f:
+                if l.startswith(b'[DATA') or l.startswith(b'[CDAT'):
+                    break
+                lines.append(l)
+        self.dataoffset=sum(len(l) for l in lines)
+        self.header=b''.join(lines).decode(errors='replace')
+        C=configparser.ConfigParser(strict=False,inline_comment_prefixes=(';',),
+                                    interpolation=None)
+        C.read_string('[settings]\n'+self.header) # config part lacks initial header
+        self.configdata=C
+        self.scalers={sc:C.getint("MS-12 A",sc,fallback=None) for sc in scaler_names}
+        self._spectra=None
+
+    def get_configuration(self):
+        """
+        returns a ConfigParser object representing the header data
+        """
+        return self.configdata
+
+    def spectra(self):
+        """
+        returns dict of spectra as int64 arrays, keyed by block name,
+        e.g. 'DATA0' for ADC1
+        """
+        if self._spectra is None:
+            with open(self.path,'rb') as f:
+                f.seek(self.dataoffset)
+                raw=f.read()
+            blocks=list(_block.finditer(raw))
+            spectra={}
+            for i,m in enumerate(blocks):
+                end=blocks[i+1].start() if i+1<len(blocks) else len(raw)
+                n=int(m.group(3))
+                values=raw[m.end():end].split(None,n)[:n]
+                spectra[(m.group(1)+m.group(2)).decode()]=np.array(values,dtype=np.int64)
+            self._spectra=spectra
+        return self._spectra
+
+    def histograms(self):
+        """
+        returns list of 1-d Histogram objects holding the adc spectra, for
+        a quick look at a run before the list file is sorted
+        """
+        from .eventlist import Histogram
+        hists=[]
+        for name,data in sorted(self.spectra().items()):
+            if not name.startswith('DATA'):
+                continue
+            adc='ADC%d'%(int(name[4:])+1,)
+            if not self.configdata.has_section(adc) or len(data)==0:
+                continue
+            h=Histogram(self,0,adc,len(data),dtype=np.uint64)
+            h.data[:]=data
+            h.S=None
+            hists.append(h)
+        return hists
@@ -26,8 +26,9 @@ import sys
 import os
 from . import __path__ as packagepath
 
-from .eventlist import Histogram, Sorter, EventSource
-from .eventlist import EventFlags, Gate2d, gatelist
+from .eventlist import Histogram, Sorter, EventSource, BATCHSIZE
+from .eventlist import EventFlags, Gate1d, Gate2d, GateMasks, gatelist
+from .mpafile import openmpa
 
 #simplify event flags
 TIMER   =EventFlags.TIMER
@@ -54,7 +55,6 @@ matplotlib.use('Qt5Agg')
 #matplotlib.rcParams['toolbar'] = 'toolmanager'
 matplotlib.rcParams['toolbar'] = 'toolbar2'
 import matplotlib.pyplot as plt
-import matplotlib.path as path
 from matplotlib.widgets import SpanSelector, PolygonSelector
 import configparser
 
@@ -111,16 +111,17 @@ class SpectrumPlotter(Qt.QObject):
     name  :    name given to histogram
     xname :    label for x axis -- default to None
     yname :    label for y axis -- default to None
+    live  :    if False, histogram is complete and not updated by a sort
     """
 
     openplotlist=[]
 
-    def __init__( self, parent, h, tree, name, xname=None, yname=None  ):
+    def __init__( self, parent, h, tree, name, xname=None, yname=None, live=True ):
         super().__init__(parent=parent)
         self.plotmodel=parent.plotmodel
         self.parent=parent
         self.histo=h
-        self.unsorted=True
+        self.unsorted=live
         self.opened=False
         self.tree=tree
         self.branchname=tree.text()
@@ -135,7 +136,8 @@ class SpectrumPlotter(Qt.QObject):
         self.timer=Qt.QTimer()
         self.timer.setInterval(2000)
         self.timer.timeout.connect(self.update)
-        parent.bthread.finished.connect(self.stop_update)
+        if live:
+            parent.bthread.finished.connect(self.stop_update)
    
     def openPlot(self):
         """
@@ -243,10 +245,11 @@ class SpectrumPlotter(Qt.QObject):
             y,yl=p._getCalibratedScale(h.adc2,h,"chan.",h.size2) ##xl->self.xname?
             if y is None:
                 y=np.arange(0.0,float(h.size2))
+            data=h.dense()
             with open(filename,"w") as f:
                 for i,xi in enumerate(x):
                     for j,yj in enumerate(y):
-                        print(xi, yj, p.histo.data[i][j], file=f)
+                        print(xi, yj, data[i][j], file=f)
   
     def select1dregion(self,lo,hi):
         h=self.histo
@@ -272,7 +275,6 @@ class SpectrumPlotter(Qt.QObject):
                                         "Select gate:",
                                         ["neutrons","gammas"], 0, False)
         self.gate=Gate2d(text, verts)
-        gatelist[text]=self.gate
         h=self.histo
         adc1=h.adc1
         adc2=h.adc2
@@ -280,22 +282,17 @@ class SpectrumPlotter(Qt.QObject):
         if h.dims==2:
             x,xl=self._getCalibratedScale(h.adc1,h,"",h.size1)
             y,yl=self._getCalibratedScale(h.adc2,h,"",h.size2)
-            data,xl,yl=h.get_plotdata()
-            self.gate.gatearray=np.full_like(data,False,dtype=np.bool)
-            nx,ny=np.shape(self.gate.gatearray)
-            #print('gate',nx,ny)
-            p=path.Path(verts)
-            for ix in range(nx):
-                for iy in range(ny):
-                    #if p.contains_point((float(iy),float(ix))):
-                    if p.contains_point((x[iy],y[ix])):
-                        self.gate.gatearray[ix,iy]=True
-                        #print(ix,iy,'True')
-                    #else: print(ix,iy, 'False')
-                  
-            h.set_gate(text)
+            if x is None: x=np.arange(float(h.size1))
+            if y is None: y=np.arange(float(h.size2))
+            # raw adc value r is at coordinate x[0]+(x[1]-x[0])*r/divisor
+            dx=(x[1]-x[0])/h.divisor1 if len(x)>1 else 1.0/h.divisor1
+            dy=(y[1]-y[0])/h.divisor2 if len(y)>1 else 1.0/h.divisor2
+            self.gate.setaxes(h.adc1,h.adc2,h.adcrange1,h.adcrange2,
+                              (dx,x[0]),(dy,y[0]))
+            gatelist[text]=self.gate
             logger.info("Gate %s set"%(text,))
             self._select_roi() # deselectroi
+            self.parent.replayGate(text)
 
     def drawPlot(self,h):
         """
@@ -425,23 +422,24 @@ def SetupSort(parent):
     logger.info("TOF Tgamma is %.2f",Tgamma)
     
     # set up event source
-    E=EventSource(infile)
+    E=EventSource(infile,writecache=parent.chkCache.isChecked())
     
-    # define histograms
-    h1=Histogram(E, GROUP_NE213, 'ADC1', 512)
-    h2=Histogram(E, GROUP_NE213, 'ADC2', 512)
-    h3=Histogram(E, GROUP_NE213, 'ADC3', 512)
-    h4=Histogram(E, GROUP_MONITOR, 'ADC4', 512)
-    h21=Histogram(E, GROUP_NE213, ('ADC1','ADC2'), (256,256),label=('L','S'))
-    h13=Histogram(E, GROUP_NE213, ('ADC1','ADC3'), (256,256),label=('L','T'))
-    histlist=[h1,h2,h3,h4,h21,h13]
-
-    # hack in gate
-    if 'neutrons' in gatelist:
-        h21.set_gate('neutrons')
-        
-    # define sort process
-    S=Sorter( E, histlist, gatelist=gatelist, maxcount=maxeventcount)
+    # define histograms: masters at full adc range are sorted, and
+    # plotted as rebinned views
+    m1,h1=MasterHistogram(E, GROUP_NE213, 'ADC1', 512)
+    m2,h2=MasterHistogram(E, GROUP_NE213, 'ADC2', 512)
+    m3,h3=MasterHistogram(E, GROUP_NE213, 'ADC3', 512)
+    m4,h4=MasterHistogram(E, GROUP_MONITOR, 'ADC4', 512)
+    m21,h21=MasterHistogram(E, GROUP_NE213, ('ADC1','ADC2'), (256,256),label=('L','S'))
+    m13,h13=MasterHistogram(E, GROUP_NE213, ('ADC1','ADC3'), (256,256),label=('L','T'))
+    histlist=[m1,m2,m3,m4,m21,m13]
+
+    # define sort process; events are kept to fill gated histograms
+    # again when gates are redrawn
+    S=Sorter( E, histlist, gatelist=gatelist, maxcount=maxeventcount,
+              window=parent.sortwindow, batchsize=BATCHSIZE,
+              follow=parent.chkFollow.isChecked(), keep=True)
+    parent.lastsort=S
 
     # create tree for plots widget
     tree=parent.plotmodel
@@ -455,15 +453,18 @@ def SetupSort(parent):
     CreatePlot( parent, tree, branch, h4, "NE213 Adc 4" )
     CreatePlot( parent, tree, branch, h21, "NE213 Adc1 v Adc2", xname="Long", yname="Short" )
     CreatePlot( parent, tree, branch, h13, "NE213 Adc1 v Adc3", xname="Long", yname="TOF" )
+    # projections are computed from the matrix when plotted, not sorted
+    CreatePlot( parent, tree, branch, h21.projection('ADC1'), "NE213 Long (L v S projection)" )
+    CreatePlot( parent, tree, branch, h21.projection('ADC2'), "NE213 Short (L v S projection)" )
 
     if Tgamma > 0.0: # Tgamma is set
         if 'neutrons' in gatelist:
-            h1g=Histogram(E, GROUP_NE213, 'ADC1', 512)
-            h2g=Histogram(E, GROUP_NE213, 'ADC2', 512)
-            h3g=Histogram(E, GROUP_NE213, 'ADC3', 512)
-            h4g=Histogram(E, GROUP_MONITOR, 'ADC4', 512)
-            h21g=Histogram(E, GROUP_NE213, ('ADC1','ADC2'), (256,256),label=('L','S'))
-            h13g=Histogram(E, GROUP_NE213, ('ADC1','ADC3'), (256,256),label=('L','T'))
+            m1g,h1g=MasterHistogram(E, GROUP_NE213, 'ADC1', 512)
+            m2g,h2g=MasterHistogram(E, GROUP_NE213, 'ADC2', 512)
+            m3g,h3g=MasterHistogram(E, GROUP_NE213, 'ADC3', 512)
+            m4g,h4g=MasterHistogram(E, GROUP_MONITOR, 'ADC4', 512)
+            m21g,h21g=MasterHistogram(E, GROUP_NE213, ('ADC1','ADC2'), (256,256),label=('L','S'))
+            m13g,h13g=MasterHistogram(E, GROUP_NE213, ('ADC1','ADC3'), (256,256),label=('L','T'))
 
         h3t=Histogram(E, GROUP_NE213, 'ADC3', 1024)
         hE=Histogram(E, GROUP_NE213, 'Cal3', 1024, label="En", calib=(250.0/1024,"En [MeV]"))
@@ -478,12 +479,12 @@ def SetupSort(parent):
             CreatePlot( parent, tree, branch, h4g, "NE213 Adc 4 (gated)" )
             CreatePlot( parent, tree, branch, h21g, "NE213 Adc1 v Adc2 (gated)", xname="Long", yname="Short" )
             CreatePlot( parent, tree, branch, h13g, "NE213 Adc1 v Adc3 (gated)", xname="Long", yname="TOF" )
-            histlist2=[h3t,hE,hv,h1g,h2g,h3g,h4g,h21g,h13g]
+            histlist2=[h3t,hE,hv,m1g,m2g,m3g,m4g,m21g,m13g]
         else:
             histlist2=[h3t,hE,hv]
             
         c=CalculatedEventSort(None)
-        S.setExtraSorter(c.sort, histlist2)
+        S.setExtraSorter(c.sortbatch, histlist2, batch=True, gate=c.gate)
 
     return S
 
@@ -494,7 +495,23 @@ def SetupSort(parent):
     t0=time.perf_counter()
     """
 
-def CreatePlot( parent, tree, branch, histo, name, xname=None, yname=None ):
+def MasterHistogram( E, group, adcs, sizes, label=None ):
+    """
+    Create a histogram of adcs at their full range, sparse if 2-d, to be
+    sorted, and a view of it rebinned to sizes channels, to be plotted.
+    Other binnings are then views of the master, without sorting again.
+
+    Returns (master, view).
+    """
+    if isinstance(adcs,str):
+        r=E.adcranges[int(adcs[3])-1]
+        m=Histogram(E, group, adcs, r, label=label)
+        return m, m.rebinned(max(r//sizes,1))
+    r=tuple(E.adcranges[int(a[3])-1] for a in adcs)
+    m=Histogram(E, group, adcs, r, label=label, sparse=True)
+    return m, m.rebinned(tuple(max(n//k,1) for n,k in zip(r,sizes)))
+
+def CreatePlot( parent, tree, branch, histo, name, xname=None, yname=None, live=True ):
     """
     Create a plot object and insert into plot tree.
 
@@ -510,14 +527,17 @@ def CreatePlot( parent, tree, branch, histo, name, xname=None, yname=None ):
         Histogram to be plotted
     name : str
         Name user will see for histogram.
+    live : bool
+        False if histogram is not being filled by a sort.
     """
-    s=SpectrumPlotter( parent, histo, branch, name, xname=xname, yname=yname)
+    s=SpectrumPlotter( parent, histo, branch, name, xname=xname, yname=yname, live=live)
     tree.appendAt( branch, name, s)
     
 
 class CalculatedEventSort(object):
     """
-    Placeholder, not integrated with rest of code.
+    Sort of calculated TOF, neutron energy and velocity, and of NE213
+    histograms gated on L above threshold and the 'neutrons' gate, if set.
     """
     def __init__( self, calibration ):
 
@@ -535,62 +555,70 @@ class CalculatedEventSort(object):
         self.chTgamma2=self.chT0-5 # arbitrary cutoff
         self.cutL=calibration.channel(data.L_threshold) # convert to channel
         logger.info("chT0, choffset, chTgamma = %5.1f, %5.1f, %5.1f"%(chT0,choffset,chT0-choffset))
-        self.start=0
-        
+        # events sorted: L above threshold, in neutron gate if set
+        self.gate=Gate1d('Lcut','ADC1',self.cutL)
+        if 'neutrons' in gatelist:
+            self.gate=self.gate&'neutrons'
+
     def sort(self,a,v,h):
-                         
+        """
+        sort one event with bitmap a and adc values v into histograms h
+        """
         v2 = v[2]
-        v0 = v[0]
         h3t = h[0]
         hE = h[1]
         hv = h[2]
-        if 'neutrons' in gatelist:
-            h1g=h[3]            
-            h2g=h[4]            
-            h3g=h[5]            
-            h4g=h[6]            
-            h21g=h[7]            
-            h13g=h[8]            
-        
+
         Tof=self.chT0-v2+np.random.rand()-0.5   # calculate TOF and spread randomly over channel
-        if v0<self.cutL: return
-        if 'neutrons' in gatelist:
-            gate=gatelist['neutrons']
-            #if self.start==0:
-                #print(gate,gate.name)
-                #print(gate.name, gate.ingate)
-            ingate=gate.ingate
-            if not ingate:
-                #print('gate',ingate)
-                return
-        #elif self.start==0:
-            #print("No gate")
-        self.start=1
-        h3t.increment([0,0,int(Tof),0])
+        if not self.gate.accepts(v): return
+        if 0<=int(Tof)<h3t.adcrange1:
+            h3t.increment([0,0,int(Tof),0])
         # if Tof too small to be n, ignore rest
         if v2>self.chTgamma2: return
 
         # calculate neutron energy from relativistic kinematics
         betan=self.choffset/Tof
         if betan>= 1.0:
-            #print("sqrt",v2,betan,Tof)
             return
         En=939.565*(1.0/np.sqrt(1.0-betan*betan)-1.0)
         En=int(En*1024/250.0+0.5)&1023
 
-        #print(Tof,vn,En,int(Tof))
-        #h1cut.increment(v)
-        #h2cut.increment(v)
         hE.increment([0,0,En,0])
-        #h3.increment(v)
         hv.increment([0,0,int(betan*1000.0+0.5),0])
 
-        h1g.increment(v)
-        h2g.increment(v)
-        h3g.increment(v)
-        h4g.increment(v)
-        h21g.increment(v)
-        h13g.increment(v)
+        # gated histograms, if any
+        for hg in h[3:]:
+            hg.increment(v)
+
+    def sortbatch(self,table,h):
+        """
+        sort an EventTable of events into histograms h, as sort() does
+        event by event
+        """
+        h3t = h[0]
+        hE = h[1]
+        hv = h[2]
+
+        t=table.filter(GateMasks(table)(self.gate)&(table['bitmap']>0))
+        v2=t['ADC3']
+        Tof=self.chT0-v2+np.random.rand(len(t))-0.5   # spread randomly over channel
+        ch=Tof.astype(np.int64)
+        h3t.fill(ch[(ch>=0)&(ch<h3t.adcrange1)])
+        # if Tof too small to be n, ignore rest
+        n=np.flatnonzero(v2<=self.chTgamma2)
+
+        # calculate neutron energy from relativistic kinematics
+        betan=self.choffset/Tof[n]
+        ok=betan<1.0
+        betan=betan[ok]
+        En=939.565*(1.0/np.sqrt(1.0-betan*betan)-1.0)
+        hE.fill((En*1024/250.0+0.5).astype(np.int64)&1023)
+        hv.fill((betan*1000.0+0.5).astype(np.int64))
+
+        # gated histograms, if any
+        tn=t.filter(n[ok])
+        for hg in h[3:]:
+            hg.incrementbatch(tn)
 
 def SetupFCSort(parent):
     """
@@ -603,7 +631,7 @@ def SetupFCSort(parent):
     infile=filepicker.files['FC']
 
     # define event source
-    E=EventSource(infile)
+    E=EventSource(infile,writecache=parent.chkCache.isChecked())
 
     # set up histograms
     h1=Histogram(E, GROUP_FC, 'ADC1', 512)
@@ -613,7 +641,8 @@ def SetupFCSort(parent):
     histlist=[h1,h3,h4,h13]
 
     # define sort task
-    S=Sorter( E, histlist)
+    S=Sorter( E, histlist, window=parent.sortwindow, batchsize=BATCHSIZE,
+              follow=parent.chkFollow.isChecked())
 
     # create tree for plots widget
     tree=parent.plotmodel
@@ -661,9 +690,13 @@ class BackgroundSort(Qt.QObject):
         start the sort task; emit signal when done to release background thread
         """
         #logger.info("start sorting task")
-        sortadc=self.sorter.sort()
-        #logger.info("end sorting task")
-        self.finished.emit()     
+        try:
+            sortadc=self.sorter.sort()
+        except Exception as e:
+            logger.error("Sort failed: %s"%(e,))
+        finally:
+            #logger.info("end sorting task")
+            self.finished.emit()
         # sort returns histogram data of adc distribution -- do something with it
     
 # initial analysis tasks
@@ -819,6 +852,34 @@ class NeutronAnalysisGui(Qt.QMainWindow):
         self.editMaxevent.editingFinished.connect(self.setMaxEvent)
         self.editMaxevent.setText("None")
         toolBar.addWidget(self.editMaxevent)
+
+        self.sortwindow=None
+
+        self.lblWindow = Qt.QLabel("Time window [ms]:",toolBar)
+        self.lblWindow.setToolTip("Sort only events in run time t1,t2 in ms, or None.\nEither limit may be left empty.")
+        toolBar.addWidget(self.lblWindow)
+        self.editWindow = Qt.QLineEdit(toolBar)
+        self.editWindow.setFixedWidth(120)
+        self.editWindow.editingFinished.connect(self.setSortWindow)
+        self.editWindow.setText("None")
+        toolBar.addWidget(self.editWindow)
+
+        toolBar.addSeparator()
+
+        self.chkFollow = Qt.QCheckBox("Follow",toolBar)
+        self.chkFollow.setToolTip("Keep sorting list files still being written by the DAQ,\nuntil stopped")
+        toolBar.addWidget(self.chkFollow)
+
+        self.chkCache = Qt.QCheckBox("Cache",toolBar)
+        self.chkCache.setToolTip("Keep decoded events beside the list file, so it is sorted\nagain without decoding. Takes about 13 bytes per event,\nmore than the list file.\nEvents kept to apply new gates are then not held in memory.")
+        toolBar.addWidget(self.chkCache)
+
+        self.btnStop = Qt.QToolButton(toolBar)
+        self.btnStop.setText("Stop")
+        self.btnStop.setIcon(Qt.QIcon(Qt.QPixmap(icons.stopicon)))
+        self.btnStop.setToolButtonStyle(Qt.Qt.ToolButtonTextUnderIcon)
+        self.btnStop.setToolTip("Stop following list file")
+        toolBar.addWidget(self.btnStop)
         
        # set up a model for spectra plots
         self.plotwidget=Qt.QWidget()
@@ -842,7 +903,9 @@ class NeutronAnalysisGui(Qt.QMainWindow):
         self.btnOpenExpt.clicked.connect(self.openFile)
         self.btnSaveExpt.clicked.connect(self.saveFile)
         self.btnSaveData.clicked.connect(self.saveDataAsHDF)
+        self.btnStop.clicked.connect(self.stopSorting)
         self.bthread = None
+        self.lastsort = None # sort with kept events, for replay of gates
 
     def makeLabel(self, title):
         """
@@ -891,6 +954,10 @@ class NeutronAnalysisGui(Qt.QMainWindow):
         menu.addAction(action)
         self.savehdfaction=action
         action.triggered.connect(self.saveDataAsHDF)
+        action=Qt.QAction('Show MPA Spectra...',None)
+        menu.addAction(action)
+        self.showmpaaction=action
+        action.triggered.connect(self.showMpaSpectra)
 
     def startSorting(self, setupsorter):
         """
@@ -910,7 +977,11 @@ class NeutronAnalysisGui(Qt.QMainWindow):
             logger.warn("Sort already in progress")
             return
         self.bthread=Qt.QThread()
-        S=setupsorter(self)
+        try:
+            S=setupsorter(self)
+        except ValueError as e:
+            logger.error("Sort not started: %s"%(e,))
+            return
         bobj=BackgroundSort(S)
         bobj.moveToThread(self.bthread)
         self.bthread.started.connect(bobj.task)
@@ -923,6 +994,43 @@ class NeutronAnalysisGui(Qt.QMainWindow):
         logger.info("Start background task: "+self.sorttype)
         #print('thread',self.bthread.isRunning())
 
+    def stopSorting(self):
+        """
+        Stop a sort which is following a list file.
+        """
+        if self.bthread is None or not self.bthread.isRunning():
+            return
+        sorter=self.bobj.sorter
+        if isinstance(sorter,Sorter) and sorter.follow:
+            sorter.stop()
+            logger.info("Stop following list file")
+
+    def replayGate(self, name):
+        """
+        Fill again the histograms of the last NE213 sort which use gate
+        name, from the events it kept, and redraw their open plots.
+        """
+        S=self.lastsort
+        if S is None:
+            return
+        if S.kept is None:
+            logger.info("Events of last sort not kept: sort again for gate %s"%(name,))
+            return
+        if self.bthread is not None and self.bthread.isRunning():
+            logger.info("Sort in progress: gate %s used from next sort"%(name,))
+            return
+        t0=time.perf_counter()
+        hists=S.replay({name})
+        if len(hists)==0:
+            logger.info("No histograms of last sort use gate %s"%(name,))
+            return
+        logger.info("Gate %s: %d histograms filled again in %.2f s"%(
+            name,len(hists),time.perf_counter()-t0))
+        for p in SpectrumPlotter.openplotlist:
+            h=getattr(p.histo,'master',p.histo) # views follow their master
+            if any(h is k for k in hists):
+                p.update()
+
     @pyqtSlot()
     def cleanupThread(self):
         """
@@ -1020,6 +1128,29 @@ class NeutronAnalysisGui(Qt.QMainWindow):
             pass # configparser.NoSectionError
         logger.info("Open file "+filename)
 
+    def showMpaSpectra(self,p):
+        """
+        Show the end of run spectra of an .mpa file, without sorting.
+
+        Parameters
+        ----------
+        p : ignored
+        """
+        filename,_=Qt.QFileDialog.getOpenFileName(self,'Open mpa file',
+                                                  '.',"MPA (*.mpa)")
+        if filename == '': return
+        try:
+            hists=openmpa(filename).histograms()
+        except (OSError,ValueError,configparser.Error) as e:
+            logger.error("Cannot read %s: %s"%(filename,e))
+            return
+        tree=self.plotmodel
+        name=os.path.basename(filename)
+        branch=tree.appendGroup( "MPA spectra "+name )
+        for h in hists:
+            CreatePlot( self, tree, branch, h, "%s %s"%(name,h.adc1), live=False )
+        logger.info("Show %d spectra from %s"%(len(hists),filename))
+
     def saveFile(self,p):
         """
         Save a file to file picked in save file dialog.
@@ -1093,7 +1224,7 @@ class NeutronAnalysisGui(Qt.QMainWindow):
                 #print(h.adc1,h.size1,h.adcrange1,h.divisor1,len(h.data))
             elif h.dims==2:
                 #print(path+"/data")
-                dset=f.create_dataset(path+"/data",data=h.data)
+                dset=f.create_dataset(path+"/data",data=h.dense())
                 dset.attrs['type']="h2"
                 dset.attrs['adc1']=h.adc1
                 dset.attrs['adc2']=h.adc2
@@ -1103,6 +1234,10 @@ class NeutronAnalysisGui(Qt.QMainWindow):
                 dset.attrs['size2']=h.size2
                 dset.attrs['divisor1']=h.divisor1
                 dset.attrs['divisor2']=h.divisor2
+            if h.timing is not None:
+                dset.attrs['realtime']=h.timing['realtime']
+                dset.attrs['livetime']=h.timing['livetime']
+                dset.attrs['deadfraction']=h.timing['deadfraction']
                 #print(h.adc1,h.size1,h.adcrange1,h.divisor1,len(h.data))
         filename,_=Qt.QFileDialog.getSaveFileName(self,'Save file',
                                                   '.',"HDF Data File (*.hdf5)")
@@ -1210,6 +1345,18 @@ class NeutronAnalysisGui(Qt.QMainWindow):
             except:
                 logger.error("Invalid input")
         #self.editMaxevent.setText("None")
+
+    def setSortWindow(self):
+        window=self.editWindow.text().strip()
+        if window == "" or window == "None" or window == "none":
+            self.sortwindow = None
+            return
+        try:
+            t1,t2=[float(t) if t.strip() else None for t in window.split(',')]
+            self.sortwindow = (t1,t2)
+            logger.info("Sort window set to %s,%s ms"%(t1,t2))
+        except ValueError:
+            logger.error("Invalid input: time window is t1,t2")
         
     """        
     def printPlot(self):
@@ -0,0 +1,185 @@
+import numpy as np
+
+"""
+Sparse storage for large 2-d histograms.
+
+A 2-d histogram at full adc resolution, e.g. 8192x8192, is too large to keep
+dense, but most of its cells are empty. BlockedCounts divides the matrix
+into square blocks (64x64 by default) and keeps only blocks with counts, in
+a dict keyed by block number. Batches are filled with one bincount over the
+blocks touched, and the matrix is made dense only when asked for, e.g. by
+numpy.asarray() for plotting or export.
+"""
+
+BLOCKSIZE=64
+
+class BlockedCounts(object):
+    """
+    2-d array of counts stored as a dict of dense blocks
+
+    Parameters
+    ----------
+        shape:     (n1,n2) shape of the dense array
+        dtype:     dtype of counts
+        blocksize: edge of square blocks, a power of two
+    """
+    ndim=2
+
+    def __init__(self, shape, dtype=np.uint32, blocksize=BLOCKSIZE):
+        if blocksize<=0 or blocksize&(blocksize-1):
+            raise ValueError("block size must be a power of two")
+        self.shape=tuple(int(n) for n in shape)
+        self.dtype=np.dtype(dtype)
+        self.blocksize=blocksize
+        self.shift=blocksize.bit_length()-1
+        self.nblocks2=(self.shape[1]+blocksize-1)//blocksize
+        self.nblocks=self.nblocks2*((self.shape[0]+blocksize-1)//blocksize)
+        self.blocks={}
+
+    @property
+    def size(self):
+        return self.shape[0]*self.shape[1]
+
+    @property
+    def nbytes(self):
+        return len(self.blocks)*self.blocksize**2*self.dtype.itemsize
+
+    def empty(self):
+        """
+        returns an empty BlockedCounts of the same shape and dtype
+        """
+        return BlockedCounts(self.shape,self.dtype,self.blocksize)
+
+    def _addblock(self, k, counts):
+        b=self.blocks.get(k)
+        if self.dtype.kind in 'ui':
+            limit=np.iinfo(self.dtype).max
+            top=0 if b is None else int(b.max())
+            if int(counts.max())>limit-top and \
+               (b is None or np.any(counts>limit-b)):
+                raise OverflowError("counts overflow %s"%(self.dtype,))
+        if b is None:
+            self.blocks[k]=counts.astype(self.dtype)
+        else:
+            b+=counts.astype(self.dtype,copy=False)
+
+    def fill(self, i1, i2, weights=None):
+        """
+        Increment cells (i1,i2) for arrays of indices, by weights if given
+        """
+        b=self.blocksize
+        s=self.shift
+        i1=np.asarray(i1,dtype=np.intp)
+        i2=np.asarray(i2,dtype=np.intp)
+        if len(i1)==0:
+            return
+        if i1.min()<0 or i2.min()<0 or \
+           i1.max()>=self.shape[0] or i2.max()>=self.shape[1]:
+            raise IndexError("index out of range of shape %s"%(self.shape,))
+        block=(i1>>s)*self.nblocks2+(i2>>s)
+        cell=((i1&(b-1))<<s)|(i2&(b-1))
+        keys=np.flatnonzero(np.bincount(block,minlength=self.nblocks))
+        slot=np.zeros(self.nblocks,dtype=np.intp)
+        slot[keys]=np.arange(len(keys))
+        counts=np.bincount(slot[block]*(b*b)+cell,weights=weights,
+                           minlength=len(keys)*b*b).reshape(len(keys),b,b)
+        for k,c in zip(keys.tolist(),counts):
+            self._addblock(k,c)
+
+    def add(self, other):
+        """
+        Add counts from a dense array or another BlockedCounts
+        """
+        b=self.blocksize
+        if isinstance(other,BlockedCounts) and other.blocksize==b:
+            for k,c in other.blocks.items():
+                self._addblock(k,c)
+            return
+        a=np.asarray(other)
+        for k in range(self.nblocks):
+            r,c=divmod(k,self.nblocks2)
+            sub=a[r*b:(r+1)*b,c*b:(c+1)*b]
+            if sub.any():
+                block=np.zeros((b,b),dtype=sub.dtype)
+                block[:sub.shape[0],:sub.shape[1]]=sub
+                self._addblock(k,block)
+
+    def _locate(self, i1, i2):
+        b=self.blocksize
+        return (i1>>self.shift)*self.nblocks2+(i2>>self.shift),i1&(b-1),i2&(b-1)
+
+    def __getitem__(self, index):
+        if isinstance(index,tuple):
+            k,r,c=self._locate(*index)
+            blk=self.blocks.get(k)
+            return self.dtype.type(0) if blk is None else blk[r,c]
+        return self.toarray()[index]
+
+    def __setitem__(self, index, value):
+        k,r,c=self._locate(*index)
+        blk=self.blocks.get(k)
+        if blk is None:
+            blk=self.blocks[k]=np.zeros((self.blocksize,)*2,dtype=self.dtype)
+        blk[r,c]=value
+
+    def toarray(self):
+        """
+        returns the counts as a dense array
+        """
+        b=self.blocksize
+        n1=-(-self.shape[0]//b)*b
+        n2=self.nblocks2*b
+        out=np.zeros((n1,n2),dtype=self.dtype)
+        for k,blk in self.blocks.items():
+            r,c=divmod(k,self.nblocks2)
+            out[r*b:(r+1)*b,c*b:(c+1)*b]=blk
+        return out[:self.shape[0],:self.shape[1]]
+
+    def rebin(self, f1, f2):
+        """
+        returns dense array of counts summed over f1 x f2 cells, without
+        making the full array dense; factors are powers of two
+        """
+        b=self.blocksize
+        out=np.zeros((-(-self.shape[0]//f1),-(-self.shape[1]//f2)),dtype=self.dtype)
+        g1,g2=min(f1,b),min(f2,b)
+        for k,blk in self.blocks.items():
+            r,c=divmod(k,self.nblocks2)
+            part=blk.reshape(b//g1,g1,b//g2,g2).sum(axis=(1,3),dtype=self.dtype)
+            r0,c0=r*b//f1,c*b//f2
+            sub=out[r0:r0+part.shape[0],c0:c0+part.shape[1]]
+            sub+=part[:sub.shape[0],:sub.shape[1]]
+        return out
+
+    def project(self, axis, lo=0, hi=None):
+        """
+        returns dense sum of counts over axis (0 or 1), for indices
+        lo<=i<hi of that axis
+        """
+        b=self.blocksize
+        hi=self.shape[axis] if hi is None else hi
+        out=np.zeros(-(-self.shape[1-axis]//b)*b,dtype=self.dtype)
+        for k,blk in self.blocks.items():
+            r,c=divmod(k,self.nblocks2)
+            if axis==1: r,c=c,r
+            i0=max(lo-r*b,0)
+            i1=min(hi-r*b,b)
+            if i0>=i1:
+                continue
+            if axis==0:
+                out[c*b:(c+1)*b]+=blk[i0:i1].sum(axis=0,dtype=self.dtype)
+            else:
+                out[c*b:(c+1)*b]+=blk[:,i0:i1].sum(axis=1,dtype=self.dtype)
+        return out[:self.shape[1-axis]]
+
+    def __array__(self, dtype=None, copy=None):
+        a=self.toarray()
+        return a if dtype is None else a.astype(dtype)
+
+    def sum(self):
+        return sum(blk.sum(dtype=np.float64 if self.dtype.kind=='f' else np.uint64)
+                   for blk in self.blocks.values())
+
+    def max(self):
+        return max((blk.max() for blk in self.blocks.values()),
+                   default=self.dtype.type(0))
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+from slang.eventlist import (EventSource, decodebuffer, TIMER, SYNCHRON, RTC,
+                             PAD, ADCEVENT, TOTALADCS)
+
+"""
+Check the vectorized decoder against eventstream() on synthetic list streams.
+
+The streams mix adc events of all patterns (padded or not, with values beyond
+the adc ranges), TIMER, SYNCHRON and RTC records and zero words, and may have
+events with the wrong padding, which leave the stream misaligned, and a last
+record which is cut short.
+"""
+
+HEADER=("[MPA3A]\r\ncmline0=test\r\ntimerreduce=0\r\n"
+        "[ADC1]\r\nrange=4096\r\n[ADC2]\r\nrange=1024\r\n"
+        "[ADC3]\r\nrange=8192\r\n[ADC4]\r\nrange=256\r\n"
+        "[LISTDATA]\r\n")
+
+def makestream(rng, nrecords, misaligned=0.002, truncate=True):
+    """
+    returns bytes of random list data of about nrecords records
+    """
+    out=bytearray()
+    for k in range(nrecords):
+        r=rng.random()
+        if r<0.05:
+            out+=bytes([rng.integers(0,256),0,0,TIMER])
+        elif r<0.06:
+            out+=b'\xff\xff\xff\xff'
+        elif r<0.065:
+            out+=bytes([rng.integers(0,256),0,0,RTC|rng.integers(0,4)*32])
+        elif r<0.075:
+            out+=b'\x00\x00\x00\x00'
+        elif r<0.08:
+            # event word with no adcs fired, but not a zero word
+            out+=bytes([0,rng.integers(1,256),0,0])
+        else:
+            b0=int(rng.integers(1,16))
+            if rng.random()<0.05: b0|=int(rng.integers(1,16))<<4
+            n=bin(b0&15).count('1')
+            padded=n%2==1
+            if rng.random()<misaligned: padded=not padded
+            out+=bytes([b0,rng.integers(0,256),rng.integers(0,256),
+                        PAD if padded else 0])
+            if padded: out+=b'\xff\xff'
+            big=rng.random()<0.05
+            for i in range(n):
+                out+=int(rng.integers(0,65536 if big else 1024)).to_bytes(2,'little')
+    if truncate and len(out)>0:
+        out=out[:len(out)-int(rng.integers(0,7))]
+    return bytes(out)
+
+def writestream(path, data):
+    with open(path,'wb') as f:
+        f.write(HEADER.encode())
+        f.write(data)
+    return str(path)
+
+def reference(filename):
+    """
+    bitmaps, values, ticks and counts of the records from eventstream()
+    """
+    E=EventSource(filename,usecache=False)
+    bitmap,values,ticks=[],[],[]
+    counts={TIMER:0,SYNCHRON:0,RTC:0,'busy':np.zeros(TOTALADCS,dtype=np.int64)}
+    stream=E.eventstream()
+    while True:
+        try:
+            t,n,a,v=next(stream)
+        except (StopIteration,IndexError):
+            # IndexError: the last event is cut short
+            break
+        if t==ADCEVENT:
+            bitmap.append(a)
+            values.append(v)
+            ticks.append(counts[TIMER])
+        else:
+            counts[t]+=1
+            if t==TIMER:
+                counts['busy']+=(n>>np.arange(TOTALADCS))&1
+    return (np.array(bitmap,dtype=np.uint8),
+            np.array(values,dtype=np.uint16).reshape(-1,TOTALADCS),
+            np.array(ticks,dtype=np.uint32),counts)
+
+def checktable(table, ref):
+    bitmap,values,ticks,counts=ref
+    assert np.array_equal(table['bitmap'],bitmap)
+    assert np.array_equal(table.values(),values)
+    assert np.array_equal(table['tick'],ticks)
+    for k in (TIMER,SYNCHRON,RTC):
+        assert table.counts[k]==counts[k]
+    assert np.array_equal(table.counts['busy'],counts['busy'])
+
+@pytest.mark.parametrize('seed',range(150))
+def test_decode_matches_eventstream(tmp_path, seed):
+    rng=np.random.default_rng(seed)
+    filename=writestream(tmp_path/'run.lst',
+                         makestream(rng,int(rng.integers(0,3000)),
+                                    misaligned=rng.choice([0,0.002,0.02])))
+    ref=reference(filename)
+    blocksize=int(rng.integers(16,2000))
+    for usemmap in (False,True):
+        E=EventSource(filename,usemmap=usemmap,usecache=False)
+        checktable(E.to_table(blocksize),ref)
+        E=EventSource(filename,usemmap=usemmap,usecache=False)
+        bitmap,values=E.decode()
+        assert np.array_equal(bitmap,ref[0])
+        assert np.array_equal(values,ref[1])
+    # small windows, which split records and misaligned events; a window
+    # must hold the longest record (14 bytes)
+    E=EventSource(filename,usecache=False)
+    raw=np.frombuffer(E.f.read(),dtype=np.uint8)
+    table,consumed=decodebuffer(raw,E.adcmasks,window=4*int(rng.integers(4,200)))
+    checktable(table,ref)
+    assert consumed<=len(raw)
+
+def test_decode_large_stream(tmp_path):
+    rng=np.random.default_rng(1000)
+    filename=writestream(tmp_path/'run.lst',makestream(rng,200000))
+    ref=reference(filename)
+    for usemmap in (False,True):
+        E=EventSource(filename,usemmap=usemmap,usecache=False)
+        checktable(E.to_table(),ref)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from slang.eventlist import EventSource, Histogram
+from test_decode import makestream, writestream, reference
+
+"""
+Check 2-d histograms against counts made directly from eventstream(), for
+adcs of different ranges (ADC1 4096, ADC2 1024 channels in the test header).
+"""
+
+GROUP=3
+
+@pytest.fixture
+def run(tmp_path):
+    rng=np.random.default_rng(19)
+    filename=writestream(tmp_path/'run.lst',makestream(rng,20000))
+    bitmap,values,ticks,counts=reference(filename)
+    return filename,values[bitmap==GROUP]
+
+def expected(values, size1, size2):
+    """
+    counts [adc2,adc1] of events in size1 x size2 channels
+    """
+    x=values[:,0]//(4096//size1)
+    y=values[:,1]//(1024//size2)
+    counts=np.zeros((size2,size1),dtype=np.int64)
+    np.add.at(counts,(y,x),1)
+    return counts
+
+@pytest.mark.parametrize('sparse',[False,True])
+def test_unequal_ranges(run, sparse):
+    filename,values=run
+    E=EventSource(filename,usecache=False)
+    table=E.to_table().group(GROUP)
+    h=Histogram(E,GROUP,('ADC1','ADC2'),(4096,1024),sparse=sparse)
+    assert h.data.shape==(1024,4096)
+    h.fill2(table['ADC1'],table['ADC2'])
+    assert np.array_equal(h.dense(),expected(values,4096,1024))
+    # rebinned view as plotted by the gui, and a histogram sorted directly
+    v=h.rebinned((16,4))
+    d=Histogram(E,GROUP,('ADC1','ADC2'),(256,256))
+    d.fill2(table['ADC1'],table['ADC2'])
+    assert np.array_equal(v.data,expected(values,256,256))
+    assert np.array_equal(v.data,d.dense())
+    p=h.projection('ADC2')
+    assert np.array_equal(p.data,np.bincount(values[:,1],minlength=1024))
+
+def test_increment_unequal_ranges(run):
+    filename,values=run
+    E=EventSource(filename,usecache=False)
+    h=Histogram(E,GROUP,('ADC1','ADC2'),(4096,1024))
+    for v in values[:500]:
+        h.increment(v)
+    assert np.array_equal(h.dense(),expected(values[:500],4096,1024))
+
+def test_snapshot_retries_sparse(run):
+    filename,values=run
+    E=EventSource(filename,usecache=False)
+    h=Histogram(E,GROUP,('ADC1','ADC2'),(4096,1024),sparse=True)
+    h.fill2(values[:,0],values[:,1])
+    toarray=h.data.toarray
+    calls=[]
+    def racing():
+        # as when the sort thread adds a block while the dict is copied
+        calls.append(1)
+        if len(calls)==1:
+            raise RuntimeError("dictionary changed size during iteration")
+        return toarray()
+    h.data.toarray=racing
+    assert np.array_equal(h.snapshot(),expected(values,4096,1024))
+    assert len(calls)==2
@@ -0,0 +1,190 @@
+import os
+import numpy as np
+import pytest
+import slang.eventlist as eventlist
+from slang import eventcache
+from slang.eventlist import EventSource, Histogram, Sorter, Gate1d, TIMER
+from test_decode import makestream, writestream, reference, checktable, HEADER
+
+"""
+Check that the ways of sorting a list file give the same histograms as a
+serial event by event sort, and that windows, seeks, the event cache and
+following a list file being written give the same events as eventstream().
+"""
+
+GATES={'high':Gate1d('high','ADC1',500),'low':Gate1d('low','ADC2',0,100)}
+
+@pytest.fixture
+def gates(monkeypatch):
+    for k,g in GATES.items():
+        monkeypatch.setitem(eventlist.gatelist,k,g)
+    return GATES
+
+def makehists(E):
+    return [Histogram(E,3,'ADC1',4096),
+            Histogram(E,3,('ADC1','ADC2'),(256,256)),
+            Histogram(E,3,('ADC1','ADC2'),(4096,1024),sparse=True),
+            Histogram(E,7,'ADC3',1024,gate='high & ~low'),
+            Histogram(E,15,('ADC4','ADC2'),(256,1024),gate='low')]
+
+def sorted_counts(filename, **kw):
+    E=EventSource(filename,usecache=kw.pop('usecache',False),
+                  writecache=kw.pop('writecache',False))
+    hists=makehists(E)
+    S=Sorter(E,hists,gatelist=GATES,**kw)
+    S.sort()
+    return [h.dense() for h in hists]
+
+@pytest.fixture(params=[0,0.01],ids=['aligned','misaligned'])
+def run(tmp_path, request):
+    rng=np.random.default_rng(8)
+    return writestream(tmp_path/'run.lst',
+                       makestream(rng,40000,misaligned=request.param,truncate=False))
+
+@pytest.mark.parametrize('kw',[dict(batchsize=997),
+                               dict(workers=3,batchsize=5000),
+                               dict(follow=True,poll=0.01,idle=0.05),
+                               dict(batchsize=2000,keep=True),
+                               dict(batchsize=2000,usecache=True,writecache=True)],
+                         ids=['batch','parallel','follow','keep','cache'])
+def test_sorts_match_serial(run, gates, kw):
+    serial=sorted_counts(run)
+    assert sum(int(h.sum()) for h in serial)>0
+    for i in range(2 if kw.get('writecache') else 1):
+        # with the cache, the second sort reads the cache written by the first
+        for a,b in zip(serial,sorted_counts(run,**dict(kw))):
+            assert np.array_equal(a,b)
+
+def test_replay_matches_serial(run, gates, monkeypatch):
+    E=EventSource(run,usecache=False)
+    hists=makehists(E)
+    S=Sorter(E,hists,gatelist=GATES,batchsize=3000,keep=True)
+    S.sort()
+    monkeypatch.setitem(eventlist.gatelist,'low',Gate1d('low','ADC2',0,300))
+    S.replay(['low'])
+    for a,b in zip(sorted_counts(run),(h.dense() for h in hists)):
+        assert np.array_equal(a,b)
+
+def events_from(ref, keep):
+    bitmap,values,ticks,counts=ref
+    return bitmap[keep],values[keep],ticks[keep]
+
+def checkevents(table, events):
+    bitmap,values,ticks=events
+    assert np.array_equal(table['bitmap'],bitmap)
+    assert np.array_equal(table.values(),values)
+    assert np.array_equal(table['tick'],ticks)
+
+@pytest.mark.parametrize('usemmap',[False,True])
+def test_window_and_seek(run, usemmap):
+    ref=reference(run)
+    ticks=ref[2]
+    nticks=ref[3][TIMER]
+    rng=np.random.default_rng(6)
+    for i in range(5):
+        t1,t2=sorted(int(t) for t in rng.integers(0,nticks+1,2))
+        E=EventSource(run,usemmap=usemmap,usecache=False)
+        E.set_window(t1,t2)
+        checkevents(E.to_table(),events_from(ref,(ticks>=t1)&(ticks<t2)))
+        E=EventSource(run,usemmap=usemmap,usecache=False)
+        E.seek_time(t1)
+        checkevents(E.to_table(),events_from(ref,ticks>=t1))
+        n=int(rng.integers(0,len(ticks)))
+        E=EventSource(run,usemmap=usemmap,usecache=False)
+        E.seek_event(n)
+        checkevents(E.to_table(),events_from(ref,slice(n,None)))
+    E=EventSource(run,usecache=False)
+    with pytest.raises(ValueError):
+        E.seek_time(nticks+1)
+
+def test_window_sort(run, gates):
+    ref=reference(run)
+    t1,t2=ref[3][TIMER]//4,ref[3][TIMER]//2
+    bitmap,values,ticks=events_from(ref,(ref[2]>=t1)&(ref[2]<t2))
+    expected=np.bincount(values[bitmap==3,0],minlength=4096)
+    for kw in (dict(),dict(batchsize=1000),dict(workers=2)):
+        assert np.array_equal(sorted_counts(run,window=(t1,t2),**kw)[0],expected)
+    with pytest.raises(ValueError):
+        sorted_counts(run,window=(ref[3][TIMER]+1,None))
+
+def test_cache_invalidated(tmp_path):
+    rng=np.random.default_rng(5)
+    filename=writestream(tmp_path/'run.lst',makestream(rng,5000))
+    ref=reference(filename)
+    E=EventSource(filename,writecache=True)
+    checktable(E.to_table(),ref)
+    E=EventSource(filename)
+    assert eventcache.load(filename,E.header) is not None
+    checktable(E.to_table(),ref)
+    # rewritten with the same size: a new modification time
+    st=os.stat(filename)
+    with open(filename,'r+b') as f:
+        f.seek(len(HEADER))
+        f.write(makestream(np.random.default_rng(56),100,truncate=False)[:64])
+    os.utime(filename,ns=(st.st_atime_ns,st.st_mtime_ns+1000))
+    E=EventSource(filename)
+    assert eventcache.load(filename,E.header) is None
+    checktable(E.to_table(),reference(filename))
+    # grown, as while being written
+    E=EventSource(filename,writecache=True)
+    E.to_table()
+    with open(filename,'ab') as f:
+        f.write(makestream(np.random.default_rng(57),100))
+    E=EventSource(filename)
+    assert eventcache.load(filename,E.header) is None
+    checktable(E.to_table(),reference(filename))
+    # other header, same size and time
+    E=EventSource(filename,writecache=True)
+    E.to_table()
+    st=os.stat(filename)
+    with open(filename,'r+b') as f:
+        f.write(b'[MPA3B]')
+    os.utime(filename,ns=(st.st_atime_ns,st.st_mtime_ns))
+    E=EventSource(filename)
+    assert eventcache.load(filename,E.header) is None
+
+def test_follow_partial_event(tmp_path):
+    rng=np.random.default_rng(9)
+    data=makestream(rng,5000,truncate=False)
+    full=writestream(tmp_path/'full.lst',data)
+    ref=reference(full)
+    # the last record is cut short while the file is being written
+    filename=writestream(tmp_path/'run.lst',data[:-3])
+    E=EventSource(filename,usecache=False)
+    tables=E.follow(poll=0.01,idle=0.05)
+    first=next(tables)
+    with open(filename,'ab') as f:
+        f.write(data[-3:])
+    table=eventlist.EventTable.concatenate([first]+list(tables))
+    table.counts=E.counts
+    checktable(table,ref)
+    E=EventSource(filename,usemmap=True,usecache=False)
+    E.set_window(0,1)
+    with pytest.raises(ValueError):
+        next(E.follow(poll=0.01,idle=0.05))
+
+def test_compressed_and_archive(tmp_path):
+    import gzip
+    rng=np.random.default_rng(4)
+    data=makestream(rng,5000,truncate=False)
+    filename=writestream(tmp_path/'run.lst',data)
+    ref=reference(filename)
+    with gzip.open(str(tmp_path/'run.lst.gz'),'wb') as f:
+        f.write(HEADER.encode()+data)
+    E=EventSource(str(tmp_path/'run.lst.gz'))
+    checktable(E.to_table(),ref)
+    pytest.importorskip('h5py')
+    from slang import archive
+    for name in ('run.lst','run.lst.gz'):
+        A=EventSource(archive.convert(str(tmp_path/name),str(tmp_path/(name+'.h5'))))
+        checktable(A.to_table(),ref)
+
+def test_kept_events_own_memory(run, gates):
+    E=EventSource(run,usecache=False)
+    S=Sorter(E,makehists(E),batchsize=997,keep=True)
+    S.sort()
+    assert len(S.kept)>1
+    for t in S.kept:
+        for v in t.columns.values():
+            assert v.base is None
+    assert S._keptbytes==sum(v.nbytes for t in S.kept for v in t.columns.values())